@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -84,6 +85,27 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bzbzapp-default',
+    },
+    # Готовые графики: при переполнении MAX_ENTRIES удаляется сразу 1/CULL_FREQUENCY записей
+    'charts': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bzbzapp-charts',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 500,
+            'CULL_FREQUENCY': 10,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -134,4 +156,68 @@ LOGIN_URL = 'users:login'
 AUTHENTICATION_BACKENDS = [
     "django.contrib.auth.backends.ModelBackend",
     "users.authentication.EmailAuthBackend"
-]
\ No newline at end of file
+]
+
+# Tinkoff Invest API
+
+# Максимальное число параллельных запросов при загрузке свечей
+TINKOFF_MAX_WORKERS = 4
+
+# Через сколько секунд простоя закрывать канал в пуле соединений
+TINKOFF_CHANNEL_IDLE_TIMEOUT = 300
+
+# Канал, простоявший дольше стольких секунд, перед выдачей проверяется на подключение
+# (не дольше TINKOFF_CHANNEL_HEALTH_CHECK_TIMEOUT секунд) и пересоздается, если не отвечает
+TINKOFF_CHANNEL_HEALTH_CHECK_AFTER = 60
+TINKOFF_CHANNEL_HEALTH_CHECK_TIMEOUT = 1.0
+
+# Сколько секунд помнить результат проверки токена
+TINKOFF_TOKEN_CACHE_TTL = 600
+
+# Сколько секунд хранить снимок портфеля счета
+PORTFOLIO_CACHE_TTL = 60
+
+# Максимальное число одновременных запросов портфелей разных счетов
+TINKOFF_PORTFOLIO_CONCURRENCY = 5
+
+# Сколько секунд хранить курсы валют
+FX_RATES_TTL = 60
+
+# Лимиты запросов к API в минуту по сервисам (на один токен)
+TINKOFF_RATE_LIMITS = {
+    'UsersService': 100,
+    'InstrumentsService': 200,
+    'MarketDataService': 600,
+    'OperationsService': 200,
+    'default': 100,
+}
+
+# Файл с состоянием лимитов, общий для всех процессов на сервере
+TINKOFF_RATE_LIMIT_DB = os.path.join(tempfile.gettempdir(), 'bzbzapp_tinkoff_rate_limits.sqlite3')
+
+# Повторы при превышении лимита (RESOURCE_EXHAUSTED): число попыток и задержки в секундах
+TINKOFF_RETRY_ATTEMPTS = 5
+TINKOFF_RETRY_BASE_DELAY = 0.5
+TINKOFF_RETRY_MAX_DELAY = 30
+
+# Адрес локального fake-сервера API (host:port), например запущенного
+# командой run_fake_tinkoff. Пусто — работаем с настоящим Tinkoff Invest API
+TINKOFF_FAKE_SERVER = os.environ.get('TINKOFF_FAKE_SERVER', '')
+
+# Токен для служебных команд (fill_instruments)
+TINKOFF_TOKEN = os.environ.get('TINKOFF_TOKEN', '')
+
+# Размер пачки при записи каталога инструментов в базу
+INSTRUMENT_SYNC_BATCH_SIZE = 500
+
+# Как часто (в секундах) проверять, не обновился ли каталог, для индекса FIGI в памяти
+FIGI_INDEX_CHECK_INTERVAL = 60
+
+
+# Графики
+
+# Прореживать ли данные перед построением графиков (False — рисовать все точки)
+CHART_DOWNSAMPLING = True
+
+# Максимальное число точек на графике (порядка ширины экрана в пикселях)
+CHART_MAX_POINTS = 2000
@@ -0,0 +1,282 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from tinkoff.invest import CandleInterval
+
+from .models import Candle, CandleRange
+from .tinkoff_pool import tinkoff_client
+from .utils import cast_money
+
+# Интервал в минутах -> интервал свечей Tinkoff Invest API
+CANDLE_INTERVALS = {
+    1: CandleInterval.CANDLE_INTERVAL_1_MIN,
+    5: CandleInterval.CANDLE_INTERVAL_5_MIN,
+    15: CandleInterval.CANDLE_INTERVAL_15_MIN,
+    60: CandleInterval.CANDLE_INTERVAL_HOUR,
+    1440: CandleInterval.CANDLE_INTERVAL_DAY,
+}
+
+# Максимальная длина периода одного запроса GetCandles для каждого интервала
+CANDLE_CHUNK_LIMITS = {
+    1: timedelta(days=1),
+    5: timedelta(days=1),
+    15: timedelta(days=1),
+    60: timedelta(weeks=1),
+    1440: timedelta(days=365),
+}
+
+CANDLE_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+
+
+def get_candle_interval(interval):
+    """
+    Возвращает CandleInterval для интервала в минутах.
+    """
+    try:
+        return CANDLE_INTERVALS[interval]
+    except KeyError:
+        raise ValueError("Неподдерживаемый интервал")
+
+
+def as_utc(value: datetime) -> datetime:
+    """
+    Приводит datetime к aware-времени в UTC (наивное время считается UTC).
+    """
+    if timezone.is_naive(value):
+        return timezone.make_aware(value, dt_timezone.utc)
+    return value.astimezone(dt_timezone.utc)
+
+
+def floor_time(value: datetime, interval: int) -> datetime:
+    """
+    Округляет время вниз до начала свечи интервала (отсчет от эпохи, UTC).
+    """
+    epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    step = timedelta(minutes=interval)
+    return epoch + ((value - epoch) // step) * step
+
+
+def ceil_time(value: datetime, interval: int) -> datetime:
+    """
+    Округляет время вверх до границы свечи интервала.
+    """
+    floored = floor_time(value, interval)
+    return floored if floored == value else floored + timedelta(minutes=interval)
+
+
+def last_closed_time(interval: int) -> datetime:
+    """
+    Время, до которого все свечи интервала уже закрыты и не изменятся.
+    """
+    return floor_time(timezone.now().astimezone(dt_timezone.utc), interval)
+
+
+def get_missing_ranges(figi: str, interval: int, start_time: datetime, end_time: datetime):
+    """
+    Возвращает список поддиапазонов [start, end), свечи за которые еще не загружались.
+    """
+    covered = (
+        CandleRange.objects
+        .filter(figi=figi, interval=interval, start__lt=end_time, end__gt=start_time)
+        .order_by('start')
+        .values_list('start', 'end')
+    )
+
+    gaps = []
+    cursor = start_time
+    for start, end in covered:
+        if start > cursor:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+        if cursor >= end_time:
+            break
+    if cursor < end_time:
+        gaps.append((cursor, end_time))
+    return gaps
+
+
+def mark_range_loaded(figi: str, interval: int, start_time: datetime, end_time: datetime):
+    """
+    Отмечает диапазон как загруженный, объединяя его с пересекающимися соседями.
+    Незакрытые свечи (текущий период) в покрытие не попадают и будут запрошены снова.
+    """
+    end_time = min(end_time, last_closed_time(interval))
+    if start_time >= end_time:
+        return
+
+    with transaction.atomic():
+        neighbours = CandleRange.objects.select_for_update().filter(
+            figi=figi, interval=interval, start__lte=end_time, end__gte=start_time
+        )
+        for r in neighbours:
+            start_time = min(start_time, r.start)
+            end_time = max(end_time, r.end)
+        neighbours.delete()
+        CandleRange.objects.create(figi=figi, interval=interval, start=start_time, end=end_time)
+
+
+def save_candles(figi: str, interval: int, df: pd.DataFrame):
+    """
+    Сохраняет свечи в базу; уже существующие свечи перезаписываются.
+    """
+    if df.empty:
+        return
+    Candle.objects.bulk_create(
+        [
+            Candle(figi=figi, interval=interval, time=row.time, open=row.open, high=row.high,
+                   low=row.low, close=row.close, volume=row.volume)
+            for row in df.itertuples(index=False)
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['figi', 'interval', 'time'],
+        update_fields=['open', 'high', 'low', 'close', 'volume'],
+    )
+
+
+def load_candles(figi: str, interval: int, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+    """
+    Читает свечи за период [start_time, end_time) из базы.
+    """
+    rows = (
+        Candle.objects
+        .filter(figi=figi, interval=interval, time__gte=start_time, time__lt=end_time)
+        .order_by('time')
+        .values_list(*CANDLE_COLUMNS)
+    )
+    df = pd.DataFrame.from_records(list(rows), columns=CANDLE_COLUMNS)
+    df['time'] = pd.to_datetime(df['time'], utc=True)
+    return df
+
+
+def fetch_candles(client, figi: str, interval: int, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+    """
+    Загружает свечи за период из Tinkoff Invest API.
+    """
+    candles = client.market_data.get_candles(
+        figi=figi,
+        from_=start_time,
+        to=end_time,
+        interval=get_candle_interval(interval)
+    ).candles
+
+    return pd.DataFrame(
+        [
+            {
+                'time': candle.time,
+                'open': cast_money(candle.open),
+                'high': cast_money(candle.high),
+                'low': cast_money(candle.low),
+                'close': cast_money(candle.close),
+                'volume': candle.volume
+            }
+            for candle in candles
+        ],
+        columns=CANDLE_COLUMNS
+    )
+
+
+def split_range(interval: int, start_time: datetime, end_time: datetime):
+    """
+    Разбивает период на куски, допустимые для одного запроса GetCandles.
+    """
+    step = CANDLE_CHUNK_LIMITS[interval]
+    chunks = []
+    while start_time < end_time:
+        chunk_end = min(start_time + step, end_time)
+        chunks.append((start_time, chunk_end))
+        start_time = chunk_end
+    return chunks
+
+
+def fetch_candles_chunked(token: str, figi: str, interval: int, ranges) -> pd.DataFrame:
+    """
+    Загружает свечи за несколько периодов: каждый период режется на куски,
+    куски запрашиваются параллельно (не более TINKOFF_MAX_WORKERS потоков),
+    результат склеивается в один DataFrame без дублей, отсортированный по времени.
+    """
+    chunks = [chunk for start, end in ranges for chunk in split_range(interval, start, end)]
+    if not chunks:
+        return pd.DataFrame(columns=CANDLE_COLUMNS)
+
+    workers = max(1, min(settings.TINKOFF_MAX_WORKERS, len(chunks)))
+    with tinkoff_client(token) as client:
+        # gRPC-канал потокобезопасен, поэтому клиент общий для всех потоков
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            frames = list(executor.map(
+                lambda chunk: fetch_candles(client, figi, interval, *chunk),
+                chunks
+            ))
+
+    df = pd.concat(frames, ignore_index=True)
+    return (
+        df.drop_duplicates(subset='time', keep='last')
+        .sort_values('time')
+        .reset_index(drop=True)
+    )
+
+
+def resample_candles(df: pd.DataFrame, interval: int) -> pd.DataFrame:
+    """
+    Строит свечи интервала interval из более мелких свечей:
+    open — первая, high — максимум, low — минимум, close — последняя, volume — сумма.
+    """
+    if df.empty:
+        return df
+    buckets = df['time'].dt.floor(f'{interval}min')
+    return (
+        df.groupby(buckets, sort=True)
+        .agg(open=('open', 'first'), high=('high', 'max'), low=('low', 'min'),
+             close=('close', 'last'), volume=('volume', 'sum'))
+        .rename_axis('time')
+        .reset_index()
+    )
+
+
+def find_source_interval(figi: str, interval: int, start_time: datetime, end_time: datetime):
+    """
+    Ищет более мелкий интервал, свечи которого уже полностью загружены за период
+    (выровненный по границам свечей interval). Возвращает его или None.
+    """
+    # Чем крупнее исходные свечи, тем меньше строк читать из базы
+    for source in sorted(CANDLE_INTERVALS, reverse=True):
+        if source >= interval or interval % source:
+            continue
+        if not get_missing_ranges(figi, source, start_time, end_time):
+            return source
+    return None
+
+
+def get_candles(token: str, figi: str, interval: int, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+    """
+    Возвращает свечи за период. Порядок поиска данных:
+    1) свечи нужного интервала в локальном хранилище;
+    2) более мелкие загруженные свечи, из которых строятся нужные;
+    3) Tinkoff Invest API — только за отсутствующие в базе поддиапазоны.
+    """
+    get_candle_interval(interval)
+    start_time, end_time = as_utc(start_time), as_utc(end_time)
+
+    gaps = get_missing_ranges(figi, interval, start_time, end_time)
+    if not gaps:
+        return load_candles(figi, interval, start_time, end_time)
+
+    aligned_start, aligned_end = floor_time(start_time, interval), ceil_time(end_time, interval)
+    source = find_source_interval(figi, interval, aligned_start, aligned_end)
+    if source is not None:
+        df = resample_candles(load_candles(figi, source, aligned_start, aligned_end), interval)
+        df = df[(df['time'] >= start_time) & (df['time'] < end_time)]
+        return df.reset_index(drop=True)
+
+    df = fetch_candles_chunked(token, figi, interval, gaps)
+    with transaction.atomic():
+        save_candles(figi, interval, df)
+        for gap_start, gap_end in gaps:
+            mark_range_loaded(figi, interval, gap_start, gap_end)
+
+    return load_candles(figi, interval, start_time, end_time)
@@ -0,0 +1,83 @@
+import hashlib
+from datetime import date
+
+from django.core.cache import caches
+from django.db.models import F
+
+from .models import TransactionVersion
+
+# Параметры, от которых зависят графики страницы транзакций (page и прочие не влияют)
+CHART_FILTERS = ('start_date', 'end_date', 'category')
+
+
+def normalize_filters(params):
+    """
+    Приводит фильтры к каноническому виду: пустые отбрасываются, даты — в ISO,
+    поэтому "2024-1-5" и "2024-01-05" дают один ключ кэша.
+    """
+    result = {}
+    for key in CHART_FILTERS:
+        value = (params.get(key) or '').strip()
+        if not value:
+            continue
+        if key.endswith('_date'):
+            try:
+                value = date(*map(int, value.split('-'))).isoformat()
+            except (TypeError, ValueError):
+                pass
+        result[key] = value
+    return result
+
+
+def get_transactions_version(user):
+    return TransactionVersion.objects.filter(author=user).values_list('version', flat=True).first() or 1
+
+
+def bump_transactions_version(user=None):
+    """
+    Увеличивает версию данных транзакций пользователя (без user — всех пользователей),
+    после чего закэшированные графики больше не используются.
+    """
+    if user is None:
+        TransactionVersion.objects.update(version=F('version') + 1)
+        return
+    if not TransactionVersion.objects.filter(author=user).update(version=F('version') + 1):
+        TransactionVersion.objects.get_or_create(author=user, defaults={'version': 2})
+
+
+class ChartCache:
+    """
+    Кэш готовых графиков (JSON plotly) по ключу
+    (пользователь, вид графика, нормализованные фильтры, версия данных пользователя).
+
+    Хранится в отдельном алиасе кэша 'charts': записи живут не дольше TIMEOUT, а при
+    переполнении MAX_ENTRIES LocMemCache удаляет сразу 1/CULL_FREQUENCY записей пачкой.
+    Версия данных читается из БД при каждом запросе (один запрос по уникальному индексу),
+    поэтому загрузка или удаление транзакций в одном процессе видны всем остальным.
+    """
+    def __init__(self, alias='charts'):
+        self._alias = alias
+
+    @property
+    def cache(self):
+        return caches[self._alias]
+
+    def key(self, user, kind, filters):
+        filters = normalize_filters(filters)
+        digest = hashlib.md5(repr(sorted(filters.items())).encode()).hexdigest()
+        return f'chart:{user.pk}:{kind}:{get_transactions_version(user)}:{digest}'
+
+    def get_or_build(self, user, kind, filters, build):
+        """
+        Возвращает JSON графика из кэша или строит его через build().
+        build() возвращает JSON-строку или None (нет данных) — None тоже кэшируется.
+        """
+        key = self.key(user, kind, filters)
+        value = self.cache.get(key)
+        if value is None:
+            value = build() or ''
+            self.cache.set(key, value)
+        return value or None
+
+
+chart_cache = ChartCache()
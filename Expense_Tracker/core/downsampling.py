@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+
+def _max_points(max_points):
+    return max_points if max_points is not None else settings.CHART_MAX_POINTS
+
+
+def _bucket_starts(n, buckets):
+    """
+    Индексы начала buckets непрерывных групп примерно одинакового размера.
+    """
+    ids = (np.arange(n) * buckets) // n
+    return np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+
+
+def downsample_ohlc(df, max_points=None):
+    """
+    Сливает соседние свечи в группы так, чтобы их было не больше max_points:
+    open — первой свечи группы, close — последней, high/low — экстремумы, volume — сумма.
+    """
+    max_points = _max_points(max_points)
+    if not settings.CHART_DOWNSAMPLING or df is None or len(df) <= max_points:
+        return df
+
+    starts = _bucket_starts(len(df), max_points)
+    ends = np.r_[starts[1:], len(df)] - 1
+
+    result = pd.DataFrame({
+        'time': df['time'].to_numpy()[starts],
+        'open': df['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(), starts),
+        'close': df['close'].to_numpy()[ends],
+    })
+    if 'volume' in df:
+        result['volume'] = np.add.reduceat(df['volume'].to_numpy(), starts)
+    return result
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: возвращает индексы threshold точек,
+    лучше всего сохраняющих форму линии.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Первая и последняя точки сохраняются, остальные делятся на threshold - 2 корзины
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Средняя точка следующей корзины (для последней — последняя точка)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample_line(x, y, max_points=None):
+    """
+    Прореживает линию методом LTTB до max_points точек. Ось X может быть датами.
+    """
+    max_points = _max_points(max_points)
+    if not settings.CHART_DOWNSAMPLING or len(x) <= max_points:
+        return x, y
+
+    x_values = np.asarray(x)
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        x_numeric = x_values.astype('datetime64[ns]').astype(np.int64)
+    else:
+        x_numeric = x_values
+    indices = lttb(x_numeric, y, max_points)
+    return x_values[indices], np.asarray(y)[indices]
@@ -0,0 +1,383 @@
+"""
+Локальный fake-сервер Tinkoff Invest API для бенчмарков и нагрузочных тестов без реального токена.
+
+Отвечает по тем же gRPC-сервисам (Users, Instruments, MarketData, Operations)
+данными из записанных фикстур или синтетическими данными, умеет добавлять задержку,
+случайные ошибки и имитировать лимиты запросов (RESOURCE_EXHAUSTED).
+Приложение переключается на него настройкой TINKOFF_FAKE_SERVER.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent import futures
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+import grpc
+from google.protobuf import json_format
+
+from tinkoff.invest.grpc import (
+    common_pb2,
+    instruments_pb2,
+    instruments_pb2_grpc,
+    marketdata_pb2,
+    marketdata_pb2_grpc,
+    operations_pb2,
+    operations_pb2_grpc,
+    users_pb2,
+    users_pb2_grpc,
+)
+
+# Интервал свечей в протоколе -> минуты
+CANDLE_MINUTES = {
+    marketdata_pb2.CANDLE_INTERVAL_1_MIN: 1,
+    marketdata_pb2.CANDLE_INTERVAL_5_MIN: 5,
+    marketdata_pb2.CANDLE_INTERVAL_15_MIN: 15,
+    marketdata_pb2.CANDLE_INTERVAL_HOUR: 60,
+    marketdata_pb2.CANDLE_INTERVAL_DAY: 1440,
+}
+
+# Методы, ответы которых можно записать в фикстуры, и классы ответов
+FIXTURE_RESPONSES = {
+    'GetAccounts': users_pb2.GetAccountsResponse,
+    'GetInfo': users_pb2.GetInfoResponse,
+    'Shares': instruments_pb2.SharesResponse,
+    'Bonds': instruments_pb2.BondsResponse,
+    'Etfs': instruments_pb2.EtfsResponse,
+    'Currencies': instruments_pb2.CurrenciesResponse,
+    'Futures': instruments_pb2.FuturesResponse,
+    'GetLastPrices': marketdata_pb2.GetLastPricesResponse,
+}
+
+
+def quotation(value):
+    units = int(value)
+    return common_pb2.Quotation(units=units, nano=int(round((value - units) * 1e9)))
+
+
+def money(value, currency='rub'):
+    units = int(value)
+    return common_pb2.MoneyValue(currency=currency, units=units, nano=int(round((value - units) * 1e9)))
+
+
+def _seed(*parts):
+    return int(hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()[:8], 16)
+
+
+class Fixtures:
+    """
+    Данные fake-сервера: ответы из JSON-фикстур (формат protobuf JSON, по файлу
+    на метод, GetPortfolio.json — словарь {счет: ответ}) или синтетические.
+    """
+    def __init__(self, directory=None, instruments=50):
+        self._directory = Path(directory) if directory else None
+        self._instruments = instruments
+        self._responses = {}
+        self._portfolios = {}
+        if self._directory is not None:
+            self._load()
+
+    def _load(self):
+        for method, response_cls in FIXTURE_RESPONSES.items():
+            path = self._directory / f'{method}.json'
+            if path.exists():
+                self._responses[method] = json_format.ParseDict(
+                    json.loads(path.read_text(encoding='utf-8')), response_cls(), ignore_unknown_fields=True
+                )
+        path = self._directory / 'GetPortfolio.json'
+        if path.exists():
+            for account_id, data in json.loads(path.read_text(encoding='utf-8')).items():
+                self._portfolios[account_id] = json_format.ParseDict(
+                    data, operations_pb2.PortfolioResponse(), ignore_unknown_fields=True
+                )
+
+    def response(self, method):
+        if method not in self._responses:
+            self._responses[method] = getattr(self, f'_synthetic_{method}')()
+        return self._responses[method]
+
+    # Синтетические данные
+
+    def _figi(self, prefix, i):
+        return f'FAKE{prefix}{i:05d}'
+
+    def _synthetic_GetAccounts(self):
+        return users_pb2.GetAccountsResponse(accounts=[
+            users_pb2.Account(id=f'20000000{i:02d}', name=f'Счет {i}',
+                              type=users_pb2.ACCOUNT_TYPE_TINKOFF, status=users_pb2.ACCOUNT_STATUS_OPEN)
+            for i in range(1, 4)
+        ])
+
+    def _synthetic_GetInfo(self):
+        return users_pb2.GetInfoResponse(prem_status=False, qual_status=False, tariff='investor')
+
+    def _synthetic_Shares(self):
+        return instruments_pb2.SharesResponse(instruments=[
+            instruments_pb2.Share(
+                figi=self._figi('SHR', i), ticker=f'SHR{i}', name=f'Акция {i}', currency='rub',
+                lot=10, exchange='MOEX', sector='it', country_of_risk='RU', country_of_risk_name='Россия',
+                nominal=money(1), trading_status=instruments_pb2.SECURITY_TRADING_STATUS_NORMAL_TRADING,
+            )
+            for i in range(self._instruments)
+        ])
+
+    def _synthetic_Bonds(self):
+        maturity = datetime(2030, 1, 1, tzinfo=dt_timezone.utc)
+        bonds = []
+        for i in range(self._instruments):
+            bond = instruments_pb2.Bond(
+                figi=self._figi('BND', i), ticker=f'BND{i}', name=f'Облигация {i}', currency='rub',
+                lot=1, exchange='MOEX', nominal=money(1000), coupon_quantity_per_year=2,
+                trading_status=instruments_pb2.SECURITY_TRADING_STATUS_NORMAL_TRADING,
+            )
+            bond.maturity_date.FromDatetime(maturity)
+            bonds.append(bond)
+        return instruments_pb2.BondsResponse(instruments=bonds)
+
+    def _synthetic_Etfs(self):
+        return instruments_pb2.EtfsResponse(instruments=[
+            instruments_pb2.Etf(
+                figi=self._figi('ETF', i), ticker=f'ETF{i}', name=f'Фонд {i}', currency='rub',
+                lot=1, exchange='MOEX', trading_status=instruments_pb2.SECURITY_TRADING_STATUS_NORMAL_TRADING,
+            )
+            for i in range(self._instruments // 5)
+        ])
+
+    def _synthetic_Currencies(self):
+        return instruments_pb2.CurrenciesResponse(instruments=[
+            instruments_pb2.Currency(
+                figi=figi, ticker=figi, name=code.upper(), currency='rub', iso_currency_name=code,
+                lot=1000, exchange='FX', trading_status=instruments_pb2.SECURITY_TRADING_STATUS_NORMAL_TRADING,
+            )
+            for code, figi in (('usd', 'USD000UTSTOM'), ('eur', 'BBG0013HJJ31'), ('cny', 'BBG0013HRTL0'))
+        ])
+
+    def _synthetic_Futures(self):
+        return instruments_pb2.FuturesResponse(instruments=[
+            instruments_pb2.Future(
+                figi=self._figi('FUT', i), ticker=f'FUT{i}', name=f'Фьючерс {i}', currency='rub',
+                lot=1, exchange='FORTS', trading_status=instruments_pb2.SECURITY_TRADING_STATUS_NORMAL_TRADING,
+            )
+            for i in range(self._instruments // 5)
+        ])
+
+    def _synthetic_GetLastPrices(self):
+        return marketdata_pb2.GetLastPricesResponse()
+
+    def last_price(self, figi):
+        for last_price in self.response('GetLastPrices').last_prices:
+            if last_price.figi == figi:
+                return last_price.price
+        return quotation(50 + _seed(figi) % 200)
+
+    def portfolio(self, account_id):
+        if account_id not in self._portfolios:
+            rnd = random.Random(_seed('portfolio', account_id))
+            shares = list(self.response('Shares').instruments)
+            positions = []
+            for share in rnd.sample(shares, min(10, len(shares))):
+                price = 50 + _seed(share.figi) % 200
+                positions.append(operations_pb2.PortfolioPosition(
+                    figi=share.figi, instrument_type='share', quantity=quotation(rnd.randint(1, 100)),
+                    average_position_price=money(price * rnd.uniform(0.8, 1.2), share.currency),
+                    expected_yield=quotation(rnd.uniform(-500, 500)), current_nkd=money(0, share.currency),
+                ))
+            self._portfolios[account_id] = operations_pb2.PortfolioResponse(positions=positions)
+        return self._portfolios[account_id]
+
+    def candles(self, figi, start, end, interval):
+        """
+        Детерминированное случайное блуждание: одинаковый запрос дает одинаковые свечи.
+        """
+        step = timedelta(minutes=interval)
+        epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+        t = epoch + -(-(start - epoch) // step) * step
+        result = []
+        while t < end:
+            rnd = random.Random(_seed(figi, interval, int(t.timestamp())))
+            base = 50 + _seed(figi) % 200
+            open_ = base * (1 + rnd.uniform(-0.05, 0.05))
+            close = open_ * (1 + rnd.uniform(-0.01, 0.01))
+            candle = marketdata_pb2.HistoricCandle(
+                open=quotation(open_), close=quotation(close),
+                high=quotation(max(open_, close) * 1.005), low=quotation(min(open_, close) * 0.995),
+                volume=rnd.randint(1, 10000), is_complete=True,
+            )
+            candle.time.FromDatetime(t)
+            result.append(candle)
+            t += step
+        return result
+
+
+class Behaviour:
+    """
+    Искажения ответов: задержка, случайные ошибки и лимиты запросов в минуту
+    на пару (токен, сервис), как у настоящего API.
+    """
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limits=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limits = rate_limits
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def apply(self, service, context):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)) / 1000)
+
+        if self.rate_limits:
+            token = dict(context.invocation_metadata()).get('authorization', '')
+            limit = self.rate_limits.get(service, self.rate_limits['default'])
+            now = time.time()
+            with self._lock:
+                window_start, count = self._windows.get((token, service), (now, 0))
+                if now - window_start >= 60:
+                    window_start, count = now, 0
+                count += 1
+                self._windows[(token, service)] = (window_start, count)
+            reset = int(60 - (now - window_start)) + 1
+            if count > limit:
+                context.set_trailing_metadata((
+                    ('x-ratelimit-limit', str(limit)),
+                    ('x-ratelimit-remaining', '0'),
+                    ('x-ratelimit-reset', str(reset)),
+                ))
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, 'Превышен лимит запросов')
+
+        if self.error_rate and random.random() < self.error_rate:
+            context.abort(
+                random.choice((grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.INTERNAL)),
+                'Ошибка, внесенная fake-сервером'
+            )
+
+
+class UsersServicer(users_pb2_grpc.UsersServiceServicer):
+    def __init__(self, fixtures, behaviour):
+        self.fixtures, self.behaviour = fixtures, behaviour
+
+    def GetAccounts(self, request, context):
+        self.behaviour.apply('UsersService', context)
+        return self.fixtures.response('GetAccounts')
+
+    def GetInfo(self, request, context):
+        self.behaviour.apply('UsersService', context)
+        return self.fixtures.response('GetInfo')
+
+
+class InstrumentsServicer(instruments_pb2_grpc.InstrumentsServiceServicer):
+    def __init__(self, fixtures, behaviour):
+        self.fixtures, self.behaviour = fixtures, behaviour
+
+    def _list(self, method, context):
+        self.behaviour.apply('InstrumentsService', context)
+        return self.fixtures.response(method)
+
+    def Shares(self, request, context):
+        return self._list('Shares', context)
+
+    def Bonds(self, request, context):
+        return self._list('Bonds', context)
+
+    def Etfs(self, request, context):
+        return self._list('Etfs', context)
+
+    def Currencies(self, request, context):
+        return self._list('Currencies', context)
+
+    def Futures(self, request, context):
+        return self._list('Futures', context)
+
+
+class MarketDataServicer(marketdata_pb2_grpc.MarketDataServiceServicer):
+    def __init__(self, fixtures, behaviour):
+        self.fixtures, self.behaviour = fixtures, behaviour
+
+    def GetCandles(self, request, context):
+        self.behaviour.apply('MarketDataService', context)
+        interval = CANDLE_MINUTES.get(request.interval)
+        if interval is None:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'Неподдерживаемый интервал')
+        start = getattr(request, 'from').ToDatetime().replace(tzinfo=dt_timezone.utc)
+        end = request.to.ToDatetime().replace(tzinfo=dt_timezone.utc)
+        return marketdata_pb2.GetCandlesResponse(candles=self.fixtures.candles(request.figi, start, end, interval))
+
+    def GetLastPrices(self, request, context):
+        self.behaviour.apply('MarketDataService', context)
+        return marketdata_pb2.GetLastPricesResponse(last_prices=[
+            marketdata_pb2.LastPrice(figi=figi, price=self.fixtures.last_price(figi))
+            for figi in request.figi
+        ])
+
+
+class OperationsServicer(operations_pb2_grpc.OperationsServiceServicer):
+    def __init__(self, fixtures, behaviour):
+        self.fixtures, self.behaviour = fixtures, behaviour
+
+    def GetPortfolio(self, request, context):
+        self.behaviour.apply('OperationsService', context)
+        return self.fixtures.portfolio(request.account_id)
+
+
+def start_server(address='127.0.0.1:0', fixtures=None, behaviour=None, max_workers=10):
+    """
+    Запускает fake-сервер и возвращает (server, target).
+    При порте 0 порт выбирается свободный.
+    """
+    fixtures = fixtures or Fixtures()
+    behaviour = behaviour or Behaviour()
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    users_pb2_grpc.add_UsersServiceServicer_to_server(UsersServicer(fixtures, behaviour), server)
+    instruments_pb2_grpc.add_InstrumentsServiceServicer_to_server(InstrumentsServicer(fixtures, behaviour), server)
+    marketdata_pb2_grpc.add_MarketDataServiceServicer_to_server(MarketDataServicer(fixtures, behaviour), server)
+    operations_pb2_grpc.add_OperationsServiceServicer_to_server(OperationsServicer(fixtures, behaviour), server)
+    host = address.rsplit(':', 1)[0]
+    port = server.add_insecure_port(address)
+    server.start()
+    return server, f'{host}:{port}'
+
+
+def record_fixtures(token, directory, channel):
+    """
+    Записывает ответы настоящего API в JSON-фикстуры для fake-сервера.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    metadata = (('authorization', f'Bearer {token}'),)
+
+    users = users_pb2_grpc.UsersServiceStub(channel)
+    instruments = instruments_pb2_grpc.InstrumentsServiceStub(channel)
+    market_data = marketdata_pb2_grpc.MarketDataServiceStub(channel)
+    operations = operations_pb2_grpc.OperationsServiceStub(channel)
+
+    base = instruments_pb2.InstrumentsRequest(instrument_status=instruments_pb2.INSTRUMENT_STATUS_BASE)
+    responses = {
+        'GetAccounts': users.GetAccounts(users_pb2.GetAccountsRequest(), metadata=metadata),
+        'GetInfo': users.GetInfo(users_pb2.GetInfoRequest(), metadata=metadata),
+        'Shares': instruments.Shares(base, metadata=metadata),
+        'Bonds': instruments.Bonds(base, metadata=metadata),
+        'Etfs': instruments.Etfs(base, metadata=metadata),
+        'Currencies': instruments.Currencies(base, metadata=metadata),
+        'Futures': instruments.Futures(base, metadata=metadata),
+    }
+    portfolios = {
+        account.id: operations.GetPortfolio(operations_pb2.PortfolioRequest(account_id=account.id), metadata=metadata)
+        for account in responses['GetAccounts'].accounts
+    }
+    figis = {p.figi for portfolio in portfolios.values() for p in portfolio.positions}
+    figis.update(c.figi for c in responses['Currencies'].instruments)
+    responses['GetLastPrices'] = market_data.GetLastPrices(
+        marketdata_pb2.GetLastPricesRequest(figi=sorted(figis)), metadata=metadata
+    )
+
+    for method, response in responses.items():
+        (directory / f'{method}.json').write_text(
+            json.dumps(json_format.MessageToDict(response), ensure_ascii=False, indent=2), encoding='utf-8'
+        )
+    (directory / 'GetPortfolio.json').write_text(
+        json.dumps({acc: json_format.MessageToDict(r) for acc, r in portfolios.items()}, ensure_ascii=False, indent=2),
+        encoding='utf-8'
+    )
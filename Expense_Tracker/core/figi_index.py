@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pandas as pd
+from django.conf import settings
+
+from .models import Instrument, InstrumentSyncRun
+
+INDEX_COLUMNS = ['name', 'ticker', 'type', 'currency', 'lot']
+
+
+class CatalogIndex:
+    """
+    Структура в памяти процесса, построенная по каталогу инструментов.
+
+    Версия — id последнего запуска синхронизации каталога (InstrumentSyncRun); она
+    проверяется не чаще раза в FIGI_INDEX_CHECK_INTERVAL секунд, и при новой
+    синхронизации структура перестраивается методом _build().
+    """
+    def __init__(self, check_interval=None):
+        self._check_interval = check_interval
+        self._data = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def check_interval(self):
+        return self._check_interval if self._check_interval is not None else settings.FIGI_INDEX_CHECK_INTERVAL
+
+    @staticmethod
+    def _current_version():
+        return InstrumentSyncRun.objects.order_by('-pk').values_list('pk', flat=True).first()
+
+    def _build(self):
+        raise NotImplementedError
+
+    def get(self):
+        """
+        Возвращает актуальную структуру, при необходимости перестраивая ее.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._data is None or now - self._checked_at >= self.check_interval:
+                version = self._current_version()
+                if self._data is None or version != self._version:
+                    self._data = self._build()
+                    self._version = version
+                self._checked_at = now
+            return self._data
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+
+
+class FigiIndex(CatalogIndex):
+    """
+    Индекс FIGI -> (name, ticker, type, currency, lot), построенный одним запросом к реестру Instrument.
+    """
+    def _build(self):
+        rows = list(Instrument.objects.values_list('figi', *INDEX_COLUMNS))
+        return pd.DataFrame(rows, columns=['figi'] + INDEX_COLUMNS).set_index('figi')
+
+    def frame(self):
+        """
+        Возвращает актуальный индекс (DataFrame с FIGI в индексе).
+        """
+        return self.get()
+
+    def lookup(self, figis):
+        """
+        Векторно находит инструменты для целого столбца FIGI.
+
+        :param figis: Список или Series FIGI.
+        :return: DataFrame со столбцами name, ticker, type, currency, lot в порядке figis;
+                 для неизвестных FIGI name = "Unknown", остальные поля пустые.
+        """
+        result = self.frame().reindex(pd.Index(figis, dtype=object))
+        result['name'] = result['name'].fillna("Unknown")
+        return result.reset_index(drop=True)
+
+
+figi_index = FigiIndex()
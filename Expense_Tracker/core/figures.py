@@ -0,0 +1,197 @@
+"""
+Сборка графиков plotly как обычных словарей {data, layout} без go.Figure.
+
+go.Figure проверяет каждое свойство при add_trace/update_layout, что на больших
+рядах занимает основную часть времени запроса. Здесь трейсы собираются напрямую
+из столбцов NumPy, макеты заранее подготовлены, числовые массивы кодируются
+в бинарный формат plotly.js (dtype + base64), а JSON пишется через orjson, если он установлен.
+"""
+import base64
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Цвета приложения
+GREEN = '#33CC99'
+DARK_GREEN = '#009966'
+ORANGE = '#FF6633'
+COLORWAY = ['#33CC99', '#3399CC', '#6633CC', '#9933CC', '#CC33CC', '#FF3366',
+            '#FF6633', '#FF9933', '#FFCC33', '#FFFF33', '#CCFF33', '#66FF33']
+
+# Стандартный шаблон plotly (его go.Figure подставляет сам), один раз на процесс
+PLOTLY_TEMPLATE = pio.templates[pio.templates.default].to_plotly_json()
+
+# Общая часть макетов графиков
+BASE_LAYOUT = {
+    'template': PLOTLY_TEMPLATE,
+    'plot_bgcolor': '#e7e7e7',   # Цвет фона графика
+    'paper_bgcolor': 'white',    # Цвет фона всей области графика
+    'margin': {'l': 20, 'r': 70, 't': 30, 'b': 30},
+    'xaxis': {'showgrid': True},
+    'yaxis': {'showgrid': True, 'title': {'text': 'USD'}},
+}
+
+CANDLESTICK_LAYOUT = {
+    **BASE_LAYOUT,
+    'margin': {'l': 20, 'r': 70, 't': 30, 'b': 0},
+}
+
+LINE_LAYOUT = {
+    **BASE_LAYOUT,
+    'title': {'text': 'Динамика расходов'},
+    'legend': {'orientation': 'h', 'x': .5, 'xanchor': 'center'},
+    'hovermode': 'x',
+}
+
+BAR_LAYOUT = {
+    **BASE_LAYOUT,
+    'title': {'text': 'Количество категорий', 'x': 0.5},
+    'legend': {'orientation': 'h', 'x': .5, 'xanchor': 'center'},
+    'hovermode': 'x',
+    'colorway': COLORWAY,
+}
+
+PIE_LAYOUT = {
+    **BASE_LAYOUT,
+    'annotations': [
+        {'text': 'Суммарные траты<br>по категориям', 'x': 0.5, 'y': 0.5, 'font': {'size': 16}, 'showarrow': False},
+    ],
+    'width': 600,   # Фиксированная ширина графика
+    'height': 500,  # Фиксированная высота графика
+    'showlegend': True,
+    'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': -0.6, 'xanchor': 'center', 'x': 0.5},
+    'hovermode': 'x',
+    'colorway': COLORWAY,
+}
+
+PORTFOLIO_LAYOUT = {
+    'template': PLOTLY_TEMPLATE,
+    'title': {'text': 'Текущие Потери/Доходы', 'x': 0.06, 'y': 0.88},
+    'plot_bgcolor': '#e7e7e7',
+    'paper_bgcolor': 'white',
+    'height': 600,
+    'yaxis': {'zeroline': True, 'zerolinecolor': 'black', 'zerolinewidth': 2, 'automargin': True},
+    'showlegend': False,
+    'margin': {'l': 70, 'r': 70, 't': 100, 'b': 30},
+    'xaxis': {'automargin': True, 'visible': False},
+}
+
+
+def array(values):
+    """
+    Готовит столбец для JSON: числа — бинарный массив plotly.js,
+    даты — массив datetime64 (в JSON — строки ISO), остальное — список.
+    """
+    if isinstance(values, (pd.Series, pd.Index)) and isinstance(values.dtype, pd.DatetimeTZDtype):
+        # Время с часовым поясом — как его передает plotly: время UTC без смещения
+        values = pd.DatetimeIndex(values).tz_localize(None)
+    values = np.asarray(values)
+    if values.dtype.kind in 'iuf':
+        if values.dtype.kind == 'f':
+            values = values.astype('<f8', copy=False)
+        elif values.dtype.kind == 'i':
+            values = values.astype('<i4', copy=False) if np.abs(values).max(initial=0) < 2 ** 31 else values.astype('<f8')
+        else:
+            values = values.astype('<u4', copy=False) if values.max(initial=0) < 2 ** 32 else values.astype('<f8')
+        values = np.ascontiguousarray(values)
+        return {'dtype': values.dtype.str[1:], 'bdata': base64.b64encode(values.tobytes()).decode()}
+    if values.dtype.kind == 'M':
+        # Даты orjson пишет сам прямо из массива, без промежуточного списка строк
+        return values.astype('datetime64[s]', copy=False)
+    return values.tolist()
+
+
+def figure(data, layout):
+    return {'data': data, 'layout': layout}
+
+
+def _default(value):
+    if value.dtype.kind == 'M':
+        return np.datetime_as_string(value, unit='s').tolist()
+    return value.tolist()
+
+
+def to_json(spec):
+    """
+    Сериализует график в JSON-строку.
+    """
+    if orjson is not None:
+        return orjson.dumps(spec, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(spec, ensure_ascii=False, default=_default)
+
+
+def candlestick(time, open_, high, low, close):
+    return figure(
+        [{
+            'type': 'candlestick',
+            'x': array(time),
+            'open': array(open_),
+            'high': array(high),
+            'low': array(low),
+            'close': array(close),
+            'increasing': {'line': {'color': GREEN}},
+            'decreasing': {'line': {'color': ORANGE}},
+        }],
+        CANDLESTICK_LAYOUT,
+    )
+
+
+def line(x, y):
+    return figure(
+        [{
+            'type': 'scatter',
+            'x': array(x),
+            'y': array(y),
+            'name': 'Expenses',
+            'mode': 'lines+markers',
+            'line': {'color': GREEN, 'width': 4},
+            'marker': {'size': 10, 'line': {'color': DARK_GREEN, 'width': 2}},
+        }],
+        LINE_LAYOUT,
+    )
+
+
+def bar(x, y):
+    return figure([{'type': 'bar', 'x': array(x), 'y': array(y), 'name': 'Category Count'}], BAR_LAYOUT)
+
+
+def pie(values, labels):
+    return figure(
+        [{'type': 'pie', 'values': array(values), 'labels': array(labels), 'name': 'Category Sum', 'hole': 0.7}],
+        PIE_LAYOUT,
+    )
+
+
+def portfolio_bars(figi, expected_yield, name, currency):
+    """
+    Один столбчатый трейс на весь портфель: цвета, подписи и customdata — массивами.
+    """
+    expected_yield = np.asarray(expected_yield, dtype=float)
+    colors = np.where(expected_yield > 0, GREEN, ORANGE).tolist()
+    figi = np.asarray(figi).tolist()
+    return figure(
+        [{
+            'type': 'bar',
+            'x': figi,
+            'y': array(expected_yield),
+            'marker': {
+                'color': colors,                         # Цвет заливки
+                'line': {'color': colors, 'width': 2},   # Обводка
+                'opacity': 0.7,                          # Прозрачность
+            },
+            'text': figi,
+            'hovertemplate': (
+                "<b>Name:</b> %{customdata[0]}<br>"  # Название актива
+                "<b>Change:</b> %{y:.2f} %{customdata[1]}<extra></extra>"  # Изменение и валюта
+            ),
+            'customdata': np.column_stack([np.asarray(name, dtype=object), np.asarray(currency, dtype=object)]).tolist(),
+        }],
+        PORTFOLIO_LAYOUT,
+    )
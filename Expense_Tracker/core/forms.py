@@ -1,6 +1,7 @@
 from django import forms
 
 from .functions import get_invest_info, get_token_accs_info, get_system_token
+from .models import Instrument
 
 from users.models import *
 
@@ -43,18 +44,48 @@ class TransactionFilterForm(forms.Form):
 
 from django import forms
 
+DURATION_CHOICES = [
+    ('1_hour', '1 Hour'),
+    ('1_day', '1 Day'),
+    ('1_week', '1 Week'),
+    ('1_month', '1 Month'),
+    ('1_year', '1 Year')
+]
+
+GRANULARITY_CHOICES = [
+    ('1', '1 Minute'),
+    ('5', '5 Minutes'),
+    ('15', '15 Minutes'),
+    ('60', '1 Hour'),
+    ('1440', '1 Day')
+]
+
+
+def check_interval(granularity, duration):
+    """
+    Проверяет соответствие интервала свечей и продолжительности.
+    """
+    if granularity in [1, 5, 15] and duration not in ['1_hour', '1_day']:
+        raise forms.ValidationError("Интервал 1, 5 или 15 минут доступен только для продолжительности 1 часа или 1 дня.")
+    if granularity == 60 and duration not in ['1_hour', '1_day', '1_week']:
+        raise forms.ValidationError("Интервал 1 час доступен только для продолжительности до 1 недели.")
+    if granularity == 1440 and duration not in ['1_day', '1_week', '1_month', '1_year']:
+        raise forms.ValidationError("Интервал 1 день доступен только для продолжительности до 1 года.")
+
+
 class InstrumentSelectionForm(forms.Form):
-    stock_figi = forms.ChoiceField(
+    # FIGI выбирается через поиск (/stocks/search/), поэтому список всех инструментов не строится
+    stock_figi = forms.CharField(
         label="Select Stock",
         required=False,
-        choices=[],
-        widget=forms.Select(attrs={'class': 'form-select'})
+        max_length=12,
+        widget=forms.HiddenInput()
     )
-    bond_figi = forms.ChoiceField(
+    bond_figi = forms.CharField(
         label="Select Bond",
         required=False,
-        choices=[],
-        widget=forms.Select(attrs={'class': 'form-select'})
+        max_length=12,
+        widget=forms.HiddenInput()
     )
     end_date = forms.DateField(
         label="End Date",
@@ -62,24 +93,12 @@ class InstrumentSelectionForm(forms.Form):
     )
     duration = forms.ChoiceField(
         label="Duration",
-        choices=[
-            ('1_hour', '1 Hour'),
-            ('1_day', '1 Day'),
-            ('1_week', '1 Week'),
-            ('1_month', '1 Month'),
-            ('1_year', '1 Year')
-        ],
+        choices=DURATION_CHOICES,
         widget=forms.Select(attrs={'class': 'form-select'})
     )
     granularity = forms.ChoiceField(
         label="Data Granularity",
-        choices=[
-            ('1', '1 Minute'),
-            ('5', '5 Minutes'),
-            ('15', '15 Minutes'),
-            ('60', '1 Hour'),
-            ('1440', '1 Day')
-        ],
+        choices=GRANULARITY_CHOICES,
         widget=forms.Select(attrs={'class': 'form-select'})
     )
 
@@ -90,8 +109,6 @@ class InstrumentSelectionForm(forms.Form):
     )
 
     def __init__(self, *args, **kwargs):
-        stocks = kwargs.pop('stocks', [])
-        bonds = kwargs.pop('bonds', [])
         user = kwargs.pop('user', None)  # Получаем текущего пользователя
 
         super().__init__(*args, **kwargs)
@@ -102,50 +119,19 @@ class InstrumentSelectionForm(forms.Form):
 
         token = get_system_token(user=user)
 
-        if get_token_accs_info(token) is None:
+        portfolio = get_token_accs_info(token)
+        if portfolio is None:
             portfolio_figi = []
         else:
             # Извлекаем FIGI активов из портфеля
-            portfolio_figi = list(get_token_accs_info(token)['figi'])
-
-        # Разделяем акции
-        owned_stocks = []
-        other_stocks = []
-        for s in stocks:
-            if s.figi in portfolio_figi:
-                owned_stocks.append((s.figi, f"{s.name} ({s.figi})"))
-                continue
-            other_stocks.append((s.figi, f"{s.name} ({s.figi})"))
-
-        # Разделяем облигации
-        owned_bonds = []
-        other_bonds = []
-        for b in bonds:
-            if b.figi in portfolio_figi:
-                owned_bonds.append((b.figi, f"{b.name} ({b.figi})"))
-                continue
-            other_bonds.append((b.figi, f"{b.name} ({b.figi})"))
-
-        # Формируем финальные списки выбора с разделителем
-        if len(portfolio_figi) == 0:
-            self.fields['stock_figi'].choices = other_stocks
-        else:
-            self.fields['stock_figi'].choices = (
-                [('', '-- Мои акции --')] +
-                owned_stocks +
-                [('-', '--- Другие доступные активы ---')] +  # Разделитель
-                other_stocks
-            )
-
-        if len(portfolio_figi) == 0:
-            self.fields['bond_figi'].choices = other_bonds
-        else:
-            self.fields['bond_figi'].choices = (
-                [('', '-- Мои облигации --')] +
-                owned_bonds +
-                [('-', '--- Другие доступные активы ---')] +  # Разделитель
-                other_bonds
-            )
+            portfolio_figi = set(portfolio['figi'])
+
+        # Сразу показываем только инструменты из портфеля, остальные — через поиск
+        owned = Instrument.objects.filter(
+            figi__in=portfolio_figi, type__in=[Instrument.SHARE, Instrument.BOND]
+        ).only('figi', 'name', 'type') if portfolio_figi else []
+        self.owned_stocks = [(i.figi, f"{i.name} ({i.figi})") for i in owned if i.type == Instrument.SHARE]
+        self.owned_bonds = [(i.figi, f"{i.name} ({i.figi})") for i in owned if i.type == Instrument.BOND]
 
     def clean(self):
         cleaned_data = super().clean()
@@ -161,14 +147,30 @@ class InstrumentSelectionForm(forms.Form):
         if not stock_figi and not bond_figi:
             raise forms.ValidationError("Выберите акцию или облигацию.")
 
-        # Проверяем соответствие интервала и продолжительности
-        if granularity in [1, 5, 15] and duration not in ['1_hour', '1_day']:
-            raise forms.ValidationError("Интервал 1, 5 или 15 минут доступен только для продолжительности 1 часа или 1 дня.")
-        if granularity == 60 and duration not in ['1_hour', '1_day', '1_week']:
-            raise forms.ValidationError("Интервал 1 час доступен только для продолжительности до 1 недели.")
-        if granularity == 1440 and duration not in ['1_day', '1_week', '1_month', '1_year']:
-            raise forms.ValidationError("Интервал 1 день доступен только для продолжительности до 1 года.")
+        # FIGI пришел из браузера — проверяем, что такой инструмент нужного типа есть в каталоге
+        instrument_type = Instrument.SHARE if stock_figi else Instrument.BOND
+        if not Instrument.objects.filter(figi=stock_figi or bond_figi, type=instrument_type, is_active=True).exists():
+            raise forms.ValidationError("Выбранный инструмент не найден в каталоге.")
 
+        check_interval(granularity, duration)
+
+        return cleaned_data
+
+
+class CandlestickChartForm(forms.Form):
+    """
+    Параметры JSON-графика свечей (/stocks/chart/).
+    """
+    figi = forms.CharField(max_length=12)
+    end_date = forms.DateField()
+    duration = forms.ChoiceField(choices=DURATION_CHOICES)
+    granularity = forms.ChoiceField(choices=GRANULARITY_CHOICES)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+        check_interval(int(cleaned_data['granularity']), cleaned_data['duration'])
         return cleaned_data
 
 
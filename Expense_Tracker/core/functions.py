@@ -1,35 +1,41 @@
+import asyncio
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from .models import *
 
-import plotly.graph_objects as go
-from plotly.offline import plot
-
 from users.models import *
 
-from tinkoff.invest import InstrumentStatus
+import numpy as np
 import pandas as pd
 
 from datetime import datetime, timedelta
+
+from . import figures
+from .candles import get_candles, get_candle_interval
+from .instrument_sync import fetch_catalog
+from .figi_index import figi_index
+from .tinkoff_pool import async_tinkoff_client, tinkoff_client
+from .tokens import is_token_valid
+from .portfolio_cache import portfolio_cache, ACCOUNTS_KEY
+from .rate_limit import scheduler
+from .downsampling import downsample_line, downsample_ohlc
+from .fx import currency_rates, get_cached_rates, get_rates, rate_figis, rates_from_last_prices, store_rates
+from .utils import cast_money
 from tinkoff.invest import Client, CandleInterval, RequestError, PortfolioResponse, PositionsResponse, PortfolioPosition
+from tinkoff.invest.exceptions import AioRequestError
 
 def get_available_assets(token):
     """
-    Возвращает список доступных акций (тикеров) из Tinkoff Invest API.
+    Возвращает списки доступных инструментов из Tinkoff Invest API:
+    (акции, облигации, фонды, валюты, фьючерсы). Списки запрашиваются параллельно.
     """
     if token is None or not isinstance(token, str):
         return None
 
-    with Client(token) as client:
-        # Получаем все акции
-        shares = client.instruments.shares(
-            instrument_status=InstrumentStatus.INSTRUMENT_STATUS_BASE  # Только базовые инструменты
-        ).instruments
-
-        bonds = client.instruments.bonds(
-            instrument_status=InstrumentStatus.INSTRUMENT_STATUS_BASE  # Только базовые инструменты
-        ).instruments
-
-    return shares, bonds
+    catalog = fetch_catalog(token)
+    return catalog['share'], catalog['bond'], catalog['etf'], catalog['currency'], catalog['future']
 
 
 # Tinkoff
@@ -80,66 +86,20 @@ def get_stock_data(
     :param end_time: Конечное время периода (datetime).
     :return: DataFrame с данными о ценах.
     """
-    # Определяем интервал свечей
-    if interval == 1:
-        candle_interval = CandleInterval.CANDLE_INTERVAL_1_MIN
-    elif interval == 5:
-        candle_interval = CandleInterval.CANDLE_INTERVAL_5_MIN
-    elif interval == 15:
-        candle_interval = CandleInterval.CANDLE_INTERVAL_15_MIN
-    elif interval == 60:
-        candle_interval = CandleInterval.CANDLE_INTERVAL_HOUR
-    elif interval == 1440:
-        candle_interval = CandleInterval.CANDLE_INTERVAL_DAY
-    else:
-        raise ValueError("Неподдерживаемый интервал")
-
-    # Проверяем корректность временного диапазона
+    # Проверяем корректность интервала и временного диапазона
+    get_candle_interval(interval)
     if start_time >= end_time:
         raise ValueError("Начальное время не может быть больше или равно конечному времени.")
 
-    # Получаем данные через Tinkoff Invest API
-    data = []
-    if get_token_accs_info(token) is None:
+    if not is_token_valid(token):
         return None
-    with Client(token) as client:
-        candles = client.market_data.get_candles(
-            figi=figi,
-            from_=start_time,
-            to=end_time,
-            interval=candle_interval
-        ).candles
-
-        if not candles:
-            raise ValueError("За указанный период данных нет.")
-
-        data = [
-            {
-                'time': candle.time,
-                'open': cast_money(candle.open),
-                'high': cast_money(candle.high),
-                'low': cast_money(candle.low),
-                'close': cast_money(candle.close),
-                'volume': candle.volume
-            }
-            for candle in candles
-        ]
 
-    # Создаем DataFrame
-    df = pd.DataFrame(data)
-    if not df.empty:
-        df['time'] = pd.to_datetime(df['time'])  # Преобразуем время в формат datetime
-        return df
+    # Свечи читаются из локального хранилища, из API догружаются только пропуски
+    df = get_candles(token, figi, interval, start_time, end_time)
+    if df.empty:
+        raise ValueError("За указанный период данных нет.")
 
-    # Если данных нет, возвращаем None
-    return None
-
-
-def cast_money(v):
-    """
-    Конвертирует значение MoneyValue в float.
-    """
-    return v.units + v.nano / 1e9
+    return df
 
 
 
@@ -181,126 +141,25 @@ def get_symbol_info(symbol):
                 "marketCap": "Not Found"
             }
 
-def get_stock_candlestick(stock_data):
-    if stock_data is None:
-        return stock_data
-
-    fig = go.Figure(
-        data=[
-            go.Candlestick(
-                x=stock_data['time'],
-                high=stock_data['high'],
-                low=stock_data['low'],
-                open=stock_data['open'],
-                close=stock_data['close'],
-                increasing_line_color='#33CC99', decreasing_line_color='#FF6633'
-            )
-        ]
-    )
-
-    # Настройка макета графика
-    fig.update_layout(
-        margin=dict(l=20, r=70, t=30, b=0),  # Установка отступов (left, right, top, bottom)
-        plot_bgcolor='#e7e7e7',               # Цвет фона графика
-        paper_bgcolor='white',              # Цвет фона всей области графика
-        yaxis_title="USD",
-        xaxis=dict(showgrid=True),          # Включение сетки по оси X
-        yaxis=dict(showgrid=True)           # Включение сетки по оси Y
+def candlestick_figure(stock_data):
+    # Больше точек, чем пикселей на экране, браузеру рисовать незачем
+    stock_data = downsample_ohlc(stock_data)
+    return figures.candlestick(
+        stock_data['time'], stock_data['open'], stock_data['high'], stock_data['low'], stock_data['close'],
     )
-    return plot(fig, output_type='div')
 
 
 # Transaction functions
 
-def get_linegraph(x, y):
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x,
-                             y=y,
-                             name='Expenses',
-                             mode='lines+markers',
-                             line=dict(color='#33CC99'),
-                             marker=dict(size=10, line=dict(color='#009966', width=2)),
-                             line_width=4))
-
-    # Настройка макета графика
-    fig.update_layout(
-        title="Динамика расходов",
-        margin=dict(l=20, r=70, t=30, b=30),  # Установка отступов (left, right, top, bottom)
-        plot_bgcolor='#e7e7e7',               # Цвет фона графика
-        paper_bgcolor='white',              # Цвет фона всей области графика
-        yaxis_title="USD",
-        xaxis=dict(showgrid=True),          # Включение сетки по оси X
-        yaxis=dict(showgrid=True),           # Включение сетки по оси Y
-        legend_orientation = "h",
-        legend = dict(x=.5, xanchor="center"),
-        hovermode = "x"
-    )
-    return plot(fig, output_type='div')
-
-def get_barchart(x, y):
-    fig = go.Figure()
-    fig.add_trace(go.Bar(x=x,
-                          y=y,
-                          name='Category Count'))
-
-    fig.update_layout(
-        title="Количество категорий",
-        title_x=0.5,
-        margin=dict(l=20, r=70, t=30, b=30),  # Установка отступов (left, right, top, bottom)
-        plot_bgcolor='#e7e7e7',               # Цвет фона графика
-        paper_bgcolor='white',              # Цвет фона всей области графика
-        yaxis_title="USD",
-        xaxis=dict(showgrid=True),          # Включение сетки по оси X
-        yaxis=dict(showgrid=True),           # Включение сетки по оси Y
-        legend_orientation = "h",
-        legend = dict(x=.5, xanchor="center"),
-        hovermode = "x",
-        colorway=['#33CC99', '#3399CC', '#6633CC', '#9933CC', '#CC33CC', '#FF3366',
-                  '#FF6633', '#FF9933', '#FFCC33', '#FFFF33', '#CCFF33', '#66FF33',]
-    )
+def linegraph_figure(x, y):
+    x, y = downsample_line(x, y)
+    return figures.line(x, y)
 
-    return plot(fig, output_type='div')
-
-def get_piechart(x, y):
-
-
-    fig = go.Figure()
-    fig.add_trace(go.Pie(values=x,
-                          labels=y,
-                          name='Category Sum',
-                          hole=0.7))
-
-    fig.update_layout(
-        annotations=[
-            dict(text='Суммарные траты<br>'
-                      'по категориям', x=0.5, y=0.5, font_size=16, showarrow=False)],
-        margin=dict(l=20, r=70, t=30, b=30),  # Установка отступов (left, right, top, bottom)
-        plot_bgcolor='#e7e7e7',               # Цвет фона графика
-        paper_bgcolor='white',              # Цвет фона всей области графика
-        yaxis_title="USD",
-        xaxis=dict(showgrid=True),          # Включение сетки по оси X
-        yaxis=dict(showgrid=True),           # Включение сетки по оси Y
-        legend_orientation = "h",
-
-        width=600,  # Фиксированная ширина графика
-        height=500,  # Фиксированная высота графика
-
-        showlegend=True,  # Отображение легенды
-        legend=dict(
-            orientation="h",  # Горизонтальная ориентация легенды
-            yanchor="bottom",  # Положение легенды
-            y=-0.6,  # Сдвиг легенды вниз
-            xanchor="center",
-            x=0.5
-        ),
-
-        hovermode = "x",
-        colorway=['#33CC99', '#3399CC', '#6633CC', '#9933CC', '#CC33CC', '#FF3366',
-                  '#FF6633', '#FF9933', '#FFCC33', '#FFFF33', '#CCFF33', '#66FF33',]
-    )
+def barchart_figure(x, y):
+    return figures.bar(x, y)
 
-
-    return plot(fig, output_type='div')
+def piechart_figure(x, y):
+    return figures.pie(x, y)
 
 
 # Stock_page
@@ -308,42 +167,96 @@ def get_piechart(x, y):
 
 def get_token_accs_info(TOKEN):
 
+    if TOKEN is None:
+        return None
+
     try:
-        with Client(TOKEN) as client:
-            # т.к. есть валятные активы (у меня etf), то нужно их отконвертить в рубли
-            # я работаю только в долл, вам возможно будут нужны и др валюты
-            accounts = [acc.id for acc in client.users.get_accounts().accounts]
+        accounts = portfolio_cache.get(TOKEN, ACCOUNTS_KEY)
+        snapshots = {acc: portfolio_cache.get(TOKEN, acc) for acc in accounts or []}
+        missing = [acc for acc, df in snapshots.items() if df is None]
+
+        if accounts is None or missing:
+            # Курс и портфели всех недостающих счетов загружаются параллельно
+            accounts, fetched = async_to_sync(fetch_portfolios_async)(
+                TOKEN, missing if accounts is not None else None
+            )
+            portfolio_cache.set(TOKEN, ACCOUNTS_KEY, accounts)
+            for acc, df in fetched.items():
+                portfolio_cache.set(TOKEN, acc, df)
+            snapshots.update(fetched)
 
-            portfolio_data = []
-            for acc in accounts:
-                data = get_invest_info(TOKEN, acc)
-                data['account'] = acc
-                portfolio_data.append(data)
+        portfolio_data = []
+        for acc in accounts:
+            data = snapshots[acc]
+            data['account'] = acc
+            portfolio_data.append(data)
 
-            return pd.concat(portfolio_data)
+        return pd.concat(portfolio_data)
 
-    except RequestError as e:
+    except (RequestError, AioRequestError) as e:
         print(str(e))
 
+async def fetch_portfolios_async(TOKEN, account_ids=None):
+    """
+    Загружает портфели счетов асинхронным клиентом: курсы валют берутся из кэша
+    (или запрашиваются одним вызовом), портфели — параллельно,
+    не более TINKOFF_PORTFOLIO_CONCURRENCY запросов одновременно.
+
+    :param account_ids: Счета для загрузки; None — все счета токена.
+    :return: (список всех счетов токена, {счет: DataFrame}).
+    """
+    semaphore = asyncio.Semaphore(settings.TINKOFF_PORTFOLIO_CONCURRENCY)
+
+    async with async_tinkoff_client(TOKEN) as client:
+        accounts = [acc.id for acc in (await scheduler.call_async(
+            TOKEN, 'UsersService/GetAccounts', lambda: client.users.get_accounts()
+        )).accounts]
+        if account_ids is None:
+            account_ids = accounts
+
+        rates = get_cached_rates()
+        if rates is None:
+            figis = await sync_to_async(rate_figis)()
+            rates = rates_from_last_prices(await scheduler.call_async(
+                TOKEN, 'MarketDataService/GetLastPrices',
+                lambda: client.market_data.get_last_prices(figi=list(figis.values()))
+            ), figis)
+            store_rates(rates)
+
+        async def fetch_one(acc_id):
+            async with semaphore:
+                r: PortfolioResponse = await scheduler.call_async(
+                    TOKEN, 'OperationsService/GetPortfolio',
+                    lambda: client.operations.get_portfolio(account_id=acc_id)
+                )
+            return acc_id, portfolio_to_frame(r.positions, rates)
+
+        fetched = await asyncio.gather(*(fetch_one(acc) for acc in account_ids))
+
+    return accounts, dict(fetched)
+
 def get_invest_info(TOKEN, acc_id):
+    """
+    Возвращает снимок портфеля счета (из кэша, если он еще не устарел).
+    """
+    return portfolio_cache.get_or_fetch(TOKEN, acc_id, lambda: fetch_invest_info(TOKEN, acc_id))
+
+def fetch_invest_info(TOKEN, acc_id):
 
     try:
-        with Client(TOKEN) as client:
-            # т.к. есть валятные активы (у меня etf), то нужно их отконвертить в рубли
-            # я работаю только в долл, вам возможно будут нужны и др валюты
-            u = client.market_data.get_last_prices(figi=['USD000UTSTOM'])
-            usdrur = cast_money(u.last_prices[0].price)
+        # т.к. есть валютные активы, их нужно перевести в рубли; курсы общие и кэшируются
+        rates = get_rates(TOKEN)
 
+        with tinkoff_client(TOKEN) as client:
             r : PortfolioResponse = client.operations.get_portfolio(account_id=acc_id)
-            df = pd.DataFrame([portfolio_pose_todict(p, usdrur) for p in r.positions])
 
-            return df
+        return portfolio_to_frame(r.positions, rates)
 
     except RequestError as e:
         print(str(e))
 
-def portfolio_pose_todict(p : PortfolioPosition, usdrur):
-    r = {
+def portfolio_pose_todict(p : PortfolioPosition):
+    return {
         'figi': p.figi,
         'quantity': cast_money(p.quantity),
         'expected_yield': cast_money(p.expected_yield),
@@ -353,75 +266,42 @@ def portfolio_pose_todict(p : PortfolioPosition, usdrur):
         'nkd': cast_money(p.current_nkd),
     }
 
-    if r['currency'] == 'usd':
-        # если бы expected_yield быk бы тоже MoneyValue,
-        # то конвертацию валюты можно было бы вынести в cast_money
-        r['expected_yield'] *= usdrur
-        r['average_buy_price'] *= usdrur
-        r['nkd'] *= usdrur
-
-    r['sell_sum'] = (r['average_buy_price']*r['quantity']) + r['expected_yield'] + (r['nkd']*r['quantity'])
-    r['comission'] = r['sell_sum']*0.003
-    r['tax'] = r['expected_yield']*0.013 if r['expected_yield'] > 0 else 0
-
-    return r
-
-def get_portfolio_bars(portfolio_data):
-
-    fig = go.Figure()
-    filtered_data = portfolio_data[portfolio_data['expected_yield'] != 0.0]
-    # Добавляем столбцы на график
-    for i, row in filtered_data.iterrows():
-        fig.add_trace(
-            go.Bar(
-                x=[row['figi']],
-                y=[row['expected_yield']],
-                name=row['figi'],
-                marker=dict(
-                    color='#33CC99' if row['expected_yield'] > 0 else '#FF6633',  # Цвет заливки
-                    line=dict(color='#33CC99' if row['expected_yield'] > 0 else '#FF6633', width=2),  # Обводка
-                    opacity=0.7  # Прозрачность
-                ),
-                text=f"{row['figi']}",
-                hovertemplate=(
-                    "<b>Name:</b> %{customdata[0]}<br>"  # Название актива
-                    "<b>Change:</b> %{y:.2f} %{customdata[1]}<extra></extra>"  # Изменение и валюта
-                ),
-                customdata=[[row['name'], row['currency']]]  # Передаем дополнительные данные
-            )
-        )
-    # Настройка линии нуля посередине
-    fig.update_layout(
-        title="Текущие Потери/Доходы",
-        title_x = 0.06,
-        title_y = 0.88,
-        plot_bgcolor='#e7e7e7',  # Цвет фона графика
-        paper_bgcolor='white',  # Цвет фона всей области графика
-        height = 600,
-        yaxis=dict(
-            zeroline=True,  # Линия нуля
-            zerolinecolor="black",  # Цвет линии нуля
-            zerolinewidth=2,  # Толщина линии нуля
-            automargin=True
-        ),
-        showlegend=False,  # Убираем легенду
-        margin=dict(l=70, r=70, t=100, b=30),  # Увеличиваем нижний отступ для подписей
-        xaxis=dict(automargin=True),  # Автоматический отступ для подписей по оси X
-        xaxis_visible=False,
-    )
+def portfolio_to_frame(positions, rates):
+    """
+    Собирает DataFrame позиций портфеля; валютные суммы переводятся в рубли векторно.
+    Позиции в валюте без курса остаются в своей валюте и помечаются no_rate=True.
+    """
+    df = pd.DataFrame([portfolio_pose_todict(p) for p in positions])
+    if df.empty:
+        return df
 
-    return plot(fig, output_type='div')
+    # если бы expected_yield был бы тоже MoneyValue,
+    # то конвертацию валюты можно было бы вынести в cast_money
+    rate = currency_rates(df['currency'], rates)
+    df['no_rate'] = np.isnan(rate)
+    if df['no_rate'].any():
+        print(f"Нет курса к рублю для валют: {', '.join(sorted(df.loc[df['no_rate'], 'currency'].unique()))}")
+    rate = np.where(df['no_rate'], 1.0, rate)
+    for column in ('expected_yield', 'average_buy_price', 'nkd'):
+        df[column] *= rate
+
+    df['sell_sum'] = (df['average_buy_price']*df['quantity']) + df['expected_yield'] + (df['nkd']*df['quantity'])
+    df['comission'] = df['sell_sum']*0.003
+    df['tax'] = np.where(df['expected_yield'] > 0, df['expected_yield']*0.013, 0)
+
+    return df
+
+def portfolio_bars_figure(portfolio_data):
+    # График в рублях: позиции без курса на него не попадают
+    filtered_data = portfolio_data[(portfolio_data['expected_yield'] != 0.0) & ~portfolio_data['no_rate']]
+    return figures.portfolio_bars(
+        filtered_data['figi'], filtered_data['expected_yield'], filtered_data['name'], filtered_data['currency'],
+    )
 
 def find_name(figi):
-    try:
-        # Сначала ищем в таблице Stock
-        stock = Stock.objects.get(figi=figi)
-        return stock.name  # Возвращаем название акции
-    except ObjectDoesNotExist:
-        try:
-            # Если не нашли в таблице Stock, ищем в таблице Bond
-            bond = Bond.objects.get(figi=figi)
-            return bond.name  # Возвращаем название облигации
-        except ObjectDoesNotExist:
-            return "Unknown"  # Если не нашли ни в одной таблице, возвращаем "Unknown"
+    """
+    Название инструмента по FIGI из индекса в памяти; "Unknown", если инструмент не найден.
+    Для целого столбца используйте figi_index.lookup().
+    """
+    return figi_index.lookup([figi])['name'].iloc[0]
 
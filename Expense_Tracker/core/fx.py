@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+
+from tinkoff.invest import RequestError
+
+from .models import Currency
+from .tinkoff_pool import tinkoff_client
+from .utils import cast_money
+
+# Валюта -> FIGI инструмента с курсом к рублю (TOM) для основных валют;
+# курсы остальных валют берутся из синхронизированного каталога (Currency)
+CURRENCY_FIGIS = {
+    'usd': 'USD000UTSTOM',
+    'eur': 'BBG0013HJJ31',
+    'cny': 'BBG0013HRTL0',
+    'hkd': 'BBG0013HSW87',
+}
+
+RATES_CACHE_KEY = 'fx_rates'
+
+
+def rate_figis():
+    """
+    Возвращает {валюта: FIGI инструмента с курсом к рублю} по всем валютам каталога,
+    которые торгуются за рубли; из нескольких инструментов валюты выбирается TOM.
+    """
+    currencies = (
+        Currency.objects.filter(currency__iexact='rub')
+        .exclude(iso_currency_name__iexact='rub')
+        .exclude(instrument__is_active=False)
+        .values_list('iso_currency_name', 'ticker', 'figi')
+    )
+    figis = {}
+    for code, ticker, figi in sorted(currencies, key=lambda row: (not row[1].endswith('TOM'), row[2])):
+        figis.setdefault(code.lower(), figi)
+    figis.update(CURRENCY_FIGIS)
+    return figis
+
+
+def rates_from_last_prices(response, figis):
+    """
+    Строит Series курсов {валюта: цена в рублях} из ответа GetLastPrices.
+    Валюты без цены в ответе в Series не попадают.
+    """
+    currency_by_figi = {figi: currency for currency, figi in figis.items()}
+    rates = {'rub': 1.0}
+    for last_price in response.last_prices:
+        currency = currency_by_figi.get(last_price.figi)
+        price = cast_money(last_price.price)
+        if currency is not None and price > 0:
+            rates[currency] = price
+    return pd.Series(rates, dtype=float)
+
+
+def get_cached_rates():
+    return cache.get(RATES_CACHE_KEY)
+
+
+def store_rates(rates):
+    """
+    Кэширует полученные курсы на FX_RATES_TTL секунд, даже если часть валют без цены.
+    """
+    cache.set(RATES_CACHE_KEY, rates, settings.FX_RATES_TTL)
+
+
+def get_rates(token):
+    """
+    Возвращает курсы валют каталога к рублю. Курсы общие для всех пользователей,
+    запрашиваются одним вызовом GetLastPrices и кэшируются на FX_RATES_TTL секунд.
+    Без токена и кэша или при ошибке API возвращает None (ничего не кэшируется).
+    """
+    rates = get_cached_rates()
+    if rates is not None:
+        return rates
+    if not token:
+        return None
+
+    figis = rate_figis()
+    try:
+        with tinkoff_client(token) as client:
+            response = client.market_data.get_last_prices(figi=list(figis.values()))
+    except RequestError as e:
+        print(str(e))
+        return None
+
+    rates = rates_from_last_prices(response, figis)
+    store_rates(rates)
+    return rates
+
+
+def currency_rates(currencies, rates):
+    """
+    Возвращает массив курсов для массива кодов валют (регистр не важен).
+    Курс рубля всегда 1; для валюты без курса (rates is None или курс не получен) — NaN.
+    """
+    codes = pd.Series(currencies, dtype=object).str.lower()
+    known = {'rub': 1.0}
+    if rates is not None:
+        known.update(rates.dropna().to_dict())
+    return codes.map(known).to_numpy(dtype=float)
+
+
+def convert(amounts, currencies, rates):
+    """
+    Векторно переводит суммы в рубли.
+
+    :param amounts: Массив сумм (list, ndarray или Series).
+    :param currencies: Массив кодов валют той же длины.
+    :param rates: Курсы из get_rates() (None — курсы неизвестны).
+    :return: ndarray сумм в рублях; NaN там, где курса валюты нет.
+    """
+    return np.asarray(amounts, dtype=float) * currency_rates(currencies, rates)
@@ -0,0 +1,107 @@
+from collections import defaultdict
+from functools import reduce
+
+import numpy as np
+
+from .figi_index import CatalogIndex
+from .models import Instrument
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchData:
+    """
+    Триграммный индекс по тикеру, названию и FIGI активных инструментов.
+    Запросы короче трех символов ищутся по префиксам.
+    """
+    def __init__(self, rows):
+        self.figis, self.tickers, self.names, self.types = (list(c) for c in zip(*rows)) if rows else ([], [], [], [])
+        self.keys = [
+            (ticker.lower(), name.lower(), figi.lower())
+            for figi, ticker, name in zip(self.figis, self.tickers, self.names)
+        ]
+
+        postings = defaultdict(list)
+        prefixes = defaultdict(list)
+        for i, fields in enumerate(self.keys):
+            grams = set()
+            starts = set()
+            for field in fields:
+                grams |= trigrams(field)
+                # Префиксы тикера, FIGI и каждого слова названия для коротких запросов
+                for word in field.split():
+                    starts.update((word[:1], word[:2]))
+            for gram in grams:
+                postings[gram].append(i)
+            for start in starts:
+                prefixes[start].append(i)
+
+        self.postings = {gram: np.array(ids) for gram, ids in postings.items()}
+        self.prefixes = {start: np.array(ids) for start, ids in prefixes.items()}
+
+    def candidates(self, query):
+        if len(query) < 3:
+            return self.prefixes.get(query, np.array([], dtype=int))
+        lists = [self.postings.get(gram) for gram in trigrams(query)]
+        if any(ids is None for ids in lists):
+            return np.array([], dtype=int)
+        # Пересекаем начиная с самых коротких списков
+        return reduce(np.intersect1d, sorted(lists, key=len))
+
+    @staticmethod
+    def rank(query, ticker, name, figi):
+        """
+        Ранг совпадения: 0 — точное, 1 — префикс тикера или FIGI,
+        2 — префикс слова в названии, 3 — подстрока; None — не подходит.
+        """
+        if query in (ticker, figi):
+            return 0
+        if ticker.startswith(query) or figi.startswith(query):
+            return 1
+        if any(word.startswith(query) for word in name.split()):
+            return 2
+        if query in ticker or query in name or query in figi:
+            return 3
+        return None
+
+
+class InstrumentSearchIndex(CatalogIndex):
+    """
+    Поиск инструментов по префиксу и подстроке тикера, названия и FIGI.
+    Индекс строится одним запросом к реестру Instrument и перестраивается после синхронизации каталога.
+    """
+    def _build(self):
+        return SearchData(list(
+            Instrument.objects.filter(is_active=True).values_list('figi', 'ticker', 'name', 'type')
+        ))
+
+    def search(self, query, types=None, limit=20):
+        """
+        :param query: Строка поиска (регистр не важен).
+        :param types: Допустимые типы инструментов; None — все.
+        :param limit: Максимальное число результатов.
+        :return: Список словарей figi, ticker, name, type, лучшие совпадения первыми.
+        """
+        query = query.lower().strip()
+        if not query:
+            return []
+
+        data = self.get()
+        found = []
+        for i in data.candidates(query):
+            if types and data.types[i] not in types:
+                continue
+            rank = data.rank(query, *data.keys[i])
+            if rank is not None:
+                found.append((rank, len(data.names[i]), i))
+        found.sort()
+
+        return [
+            {'figi': data.figis[i], 'ticker': data.tickers[i], 'name': data.names[i], 'type': data.types[i]}
+            for _, _, i in found[:limit]
+        ]
+
+
+search_index = InstrumentSearchIndex()
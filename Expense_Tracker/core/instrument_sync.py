@@ -0,0 +1,258 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from tinkoff.invest import InstrumentStatus
+
+from .models import Bond, Currency, Etf, Future, Instrument, Stock
+from .tinkoff_pool import tinkoff_client
+from .utils import cast_money
+
+
+def share_fields(share):
+    """
+    Поля модели Stock из акции Tinkoff Invest API.
+    """
+    # ipo_date может прийти как Timestamp или как datetime
+    ipo_date = share.ipo_date.ToDatetime() if hasattr(share.ipo_date, 'ToDatetime') else share.ipo_date
+    return {
+        "ticker": share.ticker,
+        "name": share.name,
+        "currency": share.currency,
+        "sector": share.sector or "N/A",
+        "country_of_risk": share.country_of_risk,
+        "country_of_risk_name": share.country_of_risk_name,
+        "exchange": share.exchange,
+        "lot": share.lot,
+        "nominal": cast_money(share.nominal) if share.nominal else None,
+        "trading_status": share.trading_status,
+        "ipo_date": ipo_date,
+    }
+
+
+def bond_fields(bond):
+    """
+    Поля модели Bond из облигации Tinkoff Invest API.
+    """
+    maturity_date = bond.maturity_date.ToDatetime() if hasattr(bond.maturity_date, 'ToDatetime') else bond.maturity_date
+    return {
+        "ticker": bond.ticker,
+        "name": bond.name,
+        "currency": bond.currency,
+        "maturity_date": maturity_date,
+        "lot": bond.lot,
+        "nominal": cast_money(bond.nominal),
+        "coupon_quantity_per_year": bond.coupon_quantity_per_year,
+        "floating_coupon_flag": bond.floating_coupon_flag,
+        "perpetual_flag": bond.perpetual_flag,
+        "amortization_flag": bond.amortization_flag,
+        "exchange": bond.exchange,
+        "trading_status": bond.trading_status,
+    }
+
+
+def etf_fields(etf):
+    """
+    Поля модели Etf из фонда Tinkoff Invest API.
+    """
+    return {
+        "ticker": etf.ticker,
+        "name": etf.name,
+        "currency": etf.currency,
+        "focus_type": etf.focus_type,
+        "sector": etf.sector or "N/A",
+        "country_of_risk": etf.country_of_risk,
+        "exchange": etf.exchange,
+        "lot": etf.lot,
+        "trading_status": etf.trading_status,
+    }
+
+
+def currency_fields(currency):
+    """
+    Поля модели Currency из валюты Tinkoff Invest API.
+    """
+    return {
+        "ticker": currency.ticker,
+        "name": currency.name,
+        "currency": currency.currency,
+        "iso_currency_name": currency.iso_currency_name,
+        "exchange": currency.exchange,
+        "lot": currency.lot,
+        "nominal": cast_money(currency.nominal) if currency.nominal else None,
+        "trading_status": currency.trading_status,
+    }
+
+
+def future_fields(future):
+    """
+    Поля модели Future из фьючерса Tinkoff Invest API.
+    """
+    expiration_date = future.expiration_date.ToDatetime() if hasattr(future.expiration_date, 'ToDatetime') else future.expiration_date
+    return {
+        "ticker": future.ticker,
+        "name": future.name,
+        "currency": future.currency,
+        "futures_type": future.futures_type,
+        "asset_type": future.asset_type,
+        "basic_asset": future.basic_asset,
+        "expiration_date": expiration_date,
+        "exchange": future.exchange,
+        "lot": future.lot,
+        "trading_status": future.trading_status,
+    }
+
+
+def normalize(model, values):
+    """
+    Приводит значения к виду, в котором они вернутся из базы,
+    чтобы сравнение с существующей строкой не находило мнимых изменений.
+    """
+    result = {}
+    for name, value in values.items():
+        field = model._meta.get_field(name)
+        value = field.to_python(value)
+        if isinstance(field, models.DecimalField) and value is not None:
+            value = round(value, field.decimal_places)
+        result[name] = value
+    return result
+
+
+def content_hash(values):
+    """
+    Хэш значимых полей инструмента: по нему синхронизация понимает, что строка изменилась.
+    """
+    payload = json.dumps(values, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def sync_model(model, rows, batch_size=None):
+    """
+    Сверяет инструменты с таблицей по FIGI и хэшу данных и записывает пачками
+    только новые (bulk_create) и изменившиеся (bulk_update) строки.
+    Признак активности берется из реестра Instrument; сами пометки (вернулся в каталог,
+    исключен из каталога) ставит sync_registry. Вызывать внутри transaction.atomic().
+
+    :param model: Модель инструмента (Stock, Bond, ...).
+    :param rows: Словарь {figi: {поле: значение}}.
+    :param batch_size: Размер пачки; по умолчанию INSTRUMENT_SYNC_BATCH_SIZE.
+    :return: Словарь с числом добавленных, обновленных, неизмененных и исключенных строк,
+             списком FIGI добавленных и обновленных строк (changed) и исключенных (removed_figis).
+    """
+    batch_size = batch_size or settings.INSTRUMENT_SYNC_BATCH_SIZE
+    # Для сверки хватает FIGI, хэша и признака активности из реестра — целые строки не читаем
+    existing = {
+        figi: (pk, stored_hash, is_active)
+        for pk, figi, stored_hash, is_active in model.objects.values_list(
+            'pk', 'figi', 'content_hash', 'instrument__is_active'
+        )
+    }
+
+    to_create, to_update, fields = [], [], None
+    for figi, values in rows.items():
+        values = normalize(model, values)
+        new_hash = content_hash(values)
+        fields = fields or list(values) + ['content_hash']
+        if figi not in existing:
+            to_create.append(model(figi=figi, content_hash=new_hash, **values))
+            continue
+        pk, stored_hash, is_active = existing[figi]
+        # Вернувшийся в каталог инструмент тоже обновляем, даже если данные те же
+        if stored_hash != new_hash or not is_active:
+            to_update.append(model(pk=pk, figi=figi, content_hash=new_hash, **values))
+
+    removed = [figi for figi, (_, _, is_active) in existing.items() if is_active and figi not in rows]
+
+    model.objects.bulk_create(to_create, batch_size=batch_size)
+    if to_update:
+        model.objects.bulk_update(to_update, fields, batch_size=batch_size)
+
+    return {
+        'inserted': len(to_create),
+        'updated': len(to_update),
+        'unchanged': len(rows) - len(to_create) - len(to_update),
+        'removed': len(removed),
+        'changed': [obj.figi for obj in to_create + to_update],
+        'removed_figis': removed,
+    }
+
+
+def sync_registry(kind, model, figis, removed=(), batch_size=None):
+    """
+    Переносит добавленные и измененные инструменты в единый реестр Instrument (активными),
+    связывает с ним новые строки таблицы типа и помечает исключенные из каталога
+    неактивными. Вызывать внутри transaction.atomic().
+    """
+    batch_size = batch_size or settings.INSTRUMENT_SYNC_BATCH_SIZE
+    for i in range(0, len(figis), batch_size):
+        details = list(model.objects.filter(figi__in=figis[i:i + batch_size]))
+        Instrument.objects.bulk_create(
+            [
+                Instrument(
+                    figi=d.figi, ticker=d.ticker, type=kind, name=d.name,
+                    currency=d.currency, lot=d.lot, is_active=True, removed_at=None,
+                )
+                for d in details
+            ],
+            update_conflicts=True,
+            unique_fields=['figi'],
+            update_fields=['ticker', 'type', 'name', 'currency', 'lot', 'is_active', 'removed_at'],
+        )
+        unlinked = [d for d in details if d.instrument_id is None]
+        if unlinked:
+            ids = dict(Instrument.objects.filter(figi__in=[d.figi for d in unlinked]).values_list('figi', 'pk'))
+            for d in unlinked:
+                d.instrument_id = ids[d.figi]
+            model.objects.bulk_update(unlinked, ['instrument'])
+
+    now = timezone.now()
+    for i in range(0, len(removed), batch_size):
+        Instrument.objects.filter(figi__in=removed[i:i + batch_size]).update(is_active=False, removed_at=now)
+
+
+# Тип инструмента -> (модель, метод client.instruments, функция полей модели)
+INSTRUMENT_TYPES = {
+    Instrument.SHARE: (Stock, 'shares', share_fields),
+    Instrument.BOND: (Bond, 'bonds', bond_fields),
+    Instrument.ETF: (Etf, 'etfs', etf_fields),
+    Instrument.CURRENCY: (Currency, 'currencies', currency_fields),
+    Instrument.FUTURE: (Future, 'futures', future_fields),
+}
+
+
+def fetch_catalog(token, types=None):
+    """
+    Загружает списки инструментов всех типов параллельно через общий канал пула,
+    поэтому весь каталог грузится примерно за время самого большого списка.
+
+    :return: Словарь {тип: список инструментов}.
+    """
+    types = list(types or INSTRUMENT_TYPES)
+
+    def fetch(kind):
+        method = INSTRUMENT_TYPES[kind][1]
+        with tinkoff_client(token) as client:
+            return getattr(client.instruments, method)(
+                instrument_status=InstrumentStatus.INSTRUMENT_STATUS_BASE
+            ).instruments
+
+    with ThreadPoolExecutor(max_workers=len(types)) as executor:
+        return dict(zip(types, executor.map(fetch, types)))
+
+
+def sync_catalog(catalog, batch_size=None):
+    """
+    Записывает каталог всех типов. Вызывать внутри transaction.atomic().
+
+    :param catalog: Результат fetch_catalog().
+    :return: Словарь {тип: итог sync_model}.
+    """
+    result = {}
+    for kind, instruments in catalog.items():
+        model, _, fields = INSTRUMENT_TYPES[kind]
+        result[kind] = sync_model(model, {i.figi: fields(i) for i in instruments}, batch_size)
+        sync_registry(kind, model, result[kind]['changed'], result[kind]['removed_figis'], batch_size)
+    return result
@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from core import figures
+from core.functions import candlestick_figure, linegraph_figure
+
+
+def legacy_candlestick(stock_data):
+    # Прежняя сборка через graph_objects (с проверкой свойств)
+    fig = go.Figure(data=[go.Candlestick(
+        x=stock_data['time'], high=stock_data['high'], low=stock_data['low'],
+        open=stock_data['open'], close=stock_data['close'],
+        increasing_line_color='#33CC99', decreasing_line_color='#FF6633',
+    )])
+    fig.update_layout(
+        margin=dict(l=20, r=70, t=30, b=0), plot_bgcolor='#e7e7e7', paper_bgcolor='white',
+        yaxis_title="USD", xaxis=dict(showgrid=True), yaxis=dict(showgrid=True),
+    )
+    return fig
+
+
+def legacy_linegraph(x, y):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=x, y=y, name='Expenses', mode='lines+markers', line=dict(color='#33CC99'),
+                             marker=dict(size=10, line=dict(color='#009966', width=2)), line_width=4))
+    fig.update_layout(
+        title="Динамика расходов", margin=dict(l=20, r=70, t=30, b=30), plot_bgcolor='#e7e7e7',
+        paper_bgcolor='white', yaxis_title="USD", xaxis=dict(showgrid=True), yaxis=dict(showgrid=True),
+        legend_orientation="h", legend=dict(x=.5, xanchor="center"), hovermode="x",
+    )
+    return fig
+
+
+def sample_candles(n):
+    rng = np.random.default_rng(0)
+    close = 100 + rng.standard_normal(n).cumsum()
+    spread = rng.random(n)
+    return pd.DataFrame({
+        'time': pd.date_range('2020-01-01', periods=n, freq='min', tz='UTC'),
+        'open': close + rng.standard_normal(n) * 0.1,
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+    })
+
+
+def timed(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(body)
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает построение JSON графиков через plotly graph_objects и через core.figures "
+            "(без прореживания, чтобы в график попадали все точки).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,100000,1000000', help="Числа точек через запятую")
+        parser.add_argument('--repeat', type=int, default=3, help="Повторов на замер (берется лучший)")
+
+    @override_settings(CHART_DOWNSAMPLING=False)
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        repeat = options['repeat']
+
+        self.stdout.write(f"JSON: {'orjson' if figures.orjson is not None else 'json'}")
+        self.stdout.write(f"{'график':<12}{'точек':>10}{'plotly, мс':>14}{'figures, мс':>14}{'ускорение':>12}"
+                          f"{'plotly, КБ':>13}{'figures, КБ':>14}")
+        for n in sizes:
+            candles = sample_candles(n)
+            cases = [
+                ('candlestick',
+                 lambda: legacy_candlestick(candles).to_json(),
+                 lambda: figures.to_json(candlestick_figure(candles))),
+                ('line',
+                 lambda: legacy_linegraph(candles['time'], candles['close']).to_json(),
+                 lambda: figures.to_json(linegraph_figure(candles['time'], candles['close']))),
+            ]
+            for name, before, after in cases:
+                before_time, before_size = timed(before, repeat)
+                after_time, after_size = timed(after, repeat)
+                self.stdout.write(
+                    f"{name:<12}{n:>10}{before_time * 1000:>14.1f}{after_time * 1000:>14.1f}"
+                    f"{'x%.1f' % (before_time / after_time):>12}"
+                    f"{before_size / 1024:>13.0f}{after_size / 1024:>14.0f}"
+                )
@@ -0,0 +1,51 @@
+import time
+
+import grpc
+from django.core.management.base import BaseCommand
+
+from tinkoff.invest.services import Services
+
+from core.fake_tinkoff import start_server
+from core.tinkoff_pool import ChannelPool
+
+
+class Command(BaseCommand):
+    help = "Сравнивает накладные расходы на соединение: новый канал на каждый запрос и пул каналов."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Количество запросов в каждом режиме")
+        parser.add_argument('--target', default=None, help="Адрес уже запущенного fake-сервера (host:port)")
+
+    def handle(self, *args, **options):
+        n = options['requests']
+        server = None
+        target = options['target']
+        if target is None:
+            server, target = start_server()
+
+        token = 't.benchmark'
+        try:
+            # До: как `with Client(token)` — новый канал и соединение на каждый вызов
+            started = time.perf_counter()
+            for _ in range(n):
+                channel = grpc.insecure_channel(target)
+                Services(channel, token=token).users.get_accounts()
+                channel.close()
+            before = (time.perf_counter() - started) / n
+
+            # После: один теплый канал из пула
+            pool = ChannelPool(channel_factory=lambda: grpc.insecure_channel(target))
+            started = time.perf_counter()
+            for _ in range(n):
+                with pool.client(token) as client:
+                    client.users.get_accounts()
+            after = (time.perf_counter() - started) / n
+            pool.close_all()
+        finally:
+            if server is not None:
+                server.stop(None)
+
+        self.stdout.write(f"Запросов: {n}, сервер: {target}")
+        self.stdout.write(f"Новый канал на запрос: {before * 1000:.2f} мс/запрос")
+        self.stdout.write(f"Пул каналов:           {after * 1000:.2f} мс/запрос (каналов открыто: {pool.created})")
+        self.stdout.write(f"Ускорение: x{before / after:.1f}")
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.instrument_sync import INSTRUMENT_TYPES, fetch_catalog, sync_catalog
+from core.models import InstrumentSyncRun
+
+# Заголовки типов инструментов в итоговом отчете
+TITLES = {
+    'share': "Акции",
+    'bond': "Облигации",
+    'etf': "Фонды",
+    'currency': "Валюты",
+    'future': "Фьючерсы",
+}
+
+
+class Command(BaseCommand):
+    help = "Заполняет базу данных каталогом инструментов (акции, облигации, фонды, валюты, фьючерсы) из Tinkoff Invest API."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help="Размер пачки при записи в базу")
+        parser.add_argument('--types', nargs='+', choices=list(INSTRUMENT_TYPES), default=None,
+                            help="Загружать только указанные типы инструментов")
+
+    def handle(self, *args, **kwargs):
+        token = settings.TINKOFF_TOKEN
+        if not token and not settings.TINKOFF_FAKE_SERVER:
+            raise CommandError("Задайте токен в переменной окружения TINKOFF_TOKEN.")
+        # Fake-серверу подходит любой токен
+        token = token or 't.fake'
+
+        started = time.perf_counter()
+        catalog = fetch_catalog(token, kwargs['types'])
+
+        # Сверка и запись всего каталога в одной транзакции вместе с итогом запуска
+        with transaction.atomic():
+            result = sync_catalog(catalog, kwargs['batch_size'])
+            run = InstrumentSyncRun.objects.create(
+                duration=time.perf_counter() - started,
+                **{key: sum(stats[key] for stats in result.values())
+                   for key in ('inserted', 'updated', 'unchanged', 'removed')}
+            )
+
+        for kind, stats in result.items():
+            self.stdout.write(
+                f"{TITLES[kind]}: добавлено {stats['inserted']}, обновлено {stats['updated']}, "
+                f"без изменений {stats['unchanged']}, исключено {stats['removed']}"
+            )
+        self.stdout.write(f"Готово за {run.duration:.1f} с")
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tinkoff.invest.channels import create_channel
+
+from core.fake_tinkoff import Behaviour, Fixtures, record_fixtures, start_server
+
+
+class Command(BaseCommand):
+    help = ("Запускает локальный fake-сервер Tinkoff Invest API. "
+            "Чтобы приложение работало с ним, задайте TINKOFF_FAKE_SERVER=host:port.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default='127.0.0.1:50051', help="Адрес сервера (host:port)")
+        parser.add_argument('--fixtures', default=None, help="Каталог с JSON-фикстурами; без него данные синтетические")
+        parser.add_argument('--instruments', type=int, default=50, help="Число синтетических акций и облигаций")
+        parser.add_argument('--latency', type=float, default=0.0, help="Задержка ответа, мс")
+        parser.add_argument('--jitter', type=float, default=0.0, help="Случайный разброс задержки, мс")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Доля ответов с ошибкой UNAVAILABLE/INTERNAL")
+        parser.add_argument('--rate-limit', action='store_true', help="Имитировать лимиты запросов TINKOFF_RATE_LIMITS")
+        parser.add_argument('--record', metavar='TOKEN', default=None,
+                            help="Записать ответы настоящего API в --fixtures и выйти")
+
+    def handle(self, *args, **options):
+        if options['record']:
+            if not options['fixtures']:
+                raise CommandError("Для записи укажите каталог --fixtures.")
+            with create_channel() as channel:
+                record_fixtures(options['record'], options['fixtures'], channel)
+            self.stdout.write(f"Фикстуры записаны в {options['fixtures']}")
+            return
+
+        fixtures = Fixtures(options['fixtures'], instruments=options['instruments'])
+        behaviour = Behaviour(
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            rate_limits=settings.TINKOFF_RATE_LIMITS if options['rate_limit'] else None,
+        )
+        server, target = start_server(options['address'], fixtures, behaviour)
+        self.stdout.write(f"Fake Tinkoff Invest API слушает {target}")
+        self.stdout.write(f"Запустите приложение с TINKOFF_FAKE_SERVER={target}")
+        try:
+            server.wait_for_termination()
+        except KeyboardInterrupt:
+            server.stop(None)
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.chart_cache import bump_transactions_version
+from core.rollups import check_rollups, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает сводки расходов (DailySpending, MonthlySpending) по таблице транзакций; "
+            "с --check только проверяет, что они совпадают с пересчетом.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Только сравнить сводки с пересчетом")
+        parser.add_argument('--user', default=None, help="Имя пользователя; по умолчанию все пользователи")
+        parser.add_argument('--limit', type=int, default=20, help="Сколько расхождений вывести при --check")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Пользователь {options['user']} не найден.")
+
+        if options['check']:
+            mismatches = check_rollups(user)
+            for model, key, expected, stored in mismatches[:options['limit']]:
+                self.stdout.write(f"{model.__name__} {key}: ожидается {expected}, в сводке {stored}")
+            if mismatches:
+                raise CommandError(f"Расхождений: {len(mismatches)}. Исправить: manage.py spending_rollups")
+            self.stdout.write("Сводки совпадают с транзакциями.")
+            return
+
+        counts = rebuild_rollups(user)
+        # Графики строились по старым сводкам
+        bump_transactions_version(user)
+        for model, count in counts.items():
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {count} строк")
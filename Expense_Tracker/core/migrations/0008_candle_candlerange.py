@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-18 07:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_delete_systemtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Candle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('figi', models.CharField(max_length=12, verbose_name='FIGI')),
+                ('interval', models.PositiveIntegerField(verbose_name='Интервал (мин)')),
+                ('time', models.DateTimeField(verbose_name='Время открытия')),
+                ('open', models.FloatField(verbose_name='Цена открытия')),
+                ('high', models.FloatField(verbose_name='Максимальная цена')),
+                ('low', models.FloatField(verbose_name='Минимальная цена')),
+                ('close', models.FloatField(verbose_name='Цена закрытия')),
+                ('volume', models.BigIntegerField(verbose_name='Объем')),
+            ],
+            options={
+                'verbose_name': 'Свеча',
+                'verbose_name_plural': 'Свечи',
+                'constraints': [models.UniqueConstraint(fields=('figi', 'interval', 'time'), name='unique_candle')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CandleRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('figi', models.CharField(max_length=12, verbose_name='FIGI')),
+                ('interval', models.PositiveIntegerField(verbose_name='Интервал (мин)')),
+                ('start', models.DateTimeField(verbose_name='Начало')),
+                ('end', models.DateTimeField(verbose_name='Конец')),
+            ],
+            options={
+                'verbose_name': 'Загруженный диапазон свечей',
+                'verbose_name_plural': 'Загруженные диапазоны свечей',
+                'indexes': [models.Index(fields=['figi', 'interval', 'start'], name='core_candle_figi_fc8c85_idx')],
+            },
+        ),
+    ]
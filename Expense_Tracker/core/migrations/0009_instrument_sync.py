@@ -0,0 +1,60 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_candle_candlerange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstrumentSyncRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Начало')),
+                ('duration', models.FloatField(default=0, verbose_name='Длительность (с)')),
+                ('inserted', models.PositiveIntegerField(default=0, verbose_name='Добавлено')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='Обновлено')),
+                ('unchanged', models.PositiveIntegerField(default=0, verbose_name='Без изменений')),
+                ('removed', models.PositiveIntegerField(default=0, verbose_name='Исключено')),
+            ],
+            options={
+                'verbose_name': 'Синхронизация каталога',
+                'verbose_name_plural': 'Синхронизации каталога',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='bond',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Хэш данных'),
+        ),
+        migrations.AddField(
+            model_name='bond',
+            name='is_active',
+            field=models.BooleanField(db_index=True, default=True, verbose_name='Торгуется'),
+        ),
+        migrations.AddField(
+            model_name='bond',
+            name='removed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Исключен из каталога'),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Хэш данных'),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='is_active',
+            field=models.BooleanField(db_index=True, default=True, verbose_name='Торгуется'),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='removed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Исключен из каталога'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_instrument_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Currency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(blank=True, max_length=64, verbose_name='Хэш данных')),
+                ('is_active', models.BooleanField(db_index=True, default=True, verbose_name='Торгуется')),
+                ('removed_at', models.DateTimeField(blank=True, null=True, verbose_name='Исключен из каталога')),
+                ('figi', models.CharField(max_length=12, unique=True, verbose_name='FIGI')),
+                ('ticker', models.CharField(max_length=20, verbose_name='Тикер')),
+                ('name', models.CharField(max_length=255, verbose_name='Название валюты')),
+                ('currency', models.CharField(max_length=3, verbose_name='Валюта расчетов')),
+                ('iso_currency_name', models.CharField(max_length=3, verbose_name='Код валюты ISO')),
+                ('exchange', models.CharField(max_length=50, verbose_name='Торговая площадка')),
+                ('lot', models.IntegerField(verbose_name='Лотность')),
+                ('nominal', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Номинал')),
+                ('trading_status', models.CharField(max_length=50, verbose_name='Режим торгов')),
+            ],
+            options={
+                'verbose_name': 'Валюта',
+                'verbose_name_plural': 'Валюты',
+            },
+        ),
+        migrations.CreateModel(
+            name='Etf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(blank=True, max_length=64, verbose_name='Хэш данных')),
+                ('is_active', models.BooleanField(db_index=True, default=True, verbose_name='Торгуется')),
+                ('removed_at', models.DateTimeField(blank=True, null=True, verbose_name='Исключен из каталога')),
+                ('figi', models.CharField(max_length=12, unique=True, verbose_name='FIGI')),
+                ('ticker', models.CharField(max_length=20, verbose_name='Тикер')),
+                ('name', models.CharField(max_length=255, verbose_name='Название фонда')),
+                ('currency', models.CharField(max_length=3, verbose_name='Валюта')),
+                ('focus_type', models.CharField(blank=True, max_length=50, verbose_name='Фокус инвестиций')),
+                ('sector', models.CharField(blank=True, max_length=100, null=True, verbose_name='Сектор')),
+                ('country_of_risk', models.CharField(blank=True, max_length=2, verbose_name='Код страны риска')),
+                ('exchange', models.CharField(max_length=50, verbose_name='Торговая площадка')),
+                ('lot', models.IntegerField(verbose_name='Лотность')),
+                ('trading_status', models.CharField(max_length=50, verbose_name='Режим торгов')),
+            ],
+            options={
+                'verbose_name': 'Фонд',
+                'verbose_name_plural': 'Фонды',
+            },
+        ),
+        migrations.CreateModel(
+            name='Future',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(blank=True, max_length=64, verbose_name='Хэш данных')),
+                ('is_active', models.BooleanField(db_index=True, default=True, verbose_name='Торгуется')),
+                ('removed_at', models.DateTimeField(blank=True, null=True, verbose_name='Исключен из каталога')),
+                ('figi', models.CharField(max_length=12, unique=True, verbose_name='FIGI')),
+                ('ticker', models.CharField(max_length=20, verbose_name='Тикер')),
+                ('name', models.CharField(max_length=255, verbose_name='Название фьючерса')),
+                ('currency', models.CharField(max_length=3, verbose_name='Валюта')),
+                ('futures_type', models.CharField(blank=True, max_length=50, verbose_name='Тип фьючерса')),
+                ('asset_type', models.CharField(blank=True, max_length=50, verbose_name='Тип базового актива')),
+                ('basic_asset', models.CharField(blank=True, max_length=100, verbose_name='Базовый актив')),
+                ('expiration_date', models.DateField(blank=True, null=True, verbose_name='Дата экспирации')),
+                ('exchange', models.CharField(max_length=50, verbose_name='Торговая площадка')),
+                ('lot', models.IntegerField(verbose_name='Лотность')),
+                ('trading_status', models.CharField(max_length=50, verbose_name='Режим торгов')),
+            ],
+            options={
+                'verbose_name': 'Фьючерс',
+                'verbose_name_plural': 'Фьючерсы',
+            },
+        ),
+    ]
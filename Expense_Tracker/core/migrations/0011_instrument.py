@@ -0,0 +1,62 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_etf_currency_future'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bond',
+            name='lot',
+            field=models.IntegerField(default=1, verbose_name='Лотность'),
+        ),
+        migrations.CreateModel(
+            name='Instrument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('figi', models.CharField(max_length=12, unique=True, verbose_name='FIGI')),
+                ('ticker', models.CharField(db_index=True, max_length=20, verbose_name='Тикер')),
+                ('type', models.CharField(choices=[('share', 'Акция'), ('bond', 'Облигация'), ('etf', 'Фонд'), ('currency', 'Валюта'), ('future', 'Фьючерс')], max_length=10, verbose_name='Тип')),
+                ('name', models.CharField(max_length=255, verbose_name='Название')),
+                ('currency', models.CharField(max_length=3, verbose_name='Валюта')),
+                ('lot', models.IntegerField(blank=True, null=True, verbose_name='Лотность')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Торгуется')),
+            ],
+            options={
+                'verbose_name': 'Инструмент',
+                'verbose_name_plural': 'Инструменты',
+                'indexes': [models.Index(fields=['type', 'is_active'], name='core_instru_type_51944b_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='bond',
+            name='instrument',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_detail', to='core.instrument', verbose_name='Инструмент'),
+        ),
+        migrations.AddField(
+            model_name='currency',
+            name='instrument',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_detail', to='core.instrument', verbose_name='Инструмент'),
+        ),
+        migrations.AddField(
+            model_name='etf',
+            name='instrument',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_detail', to='core.instrument', verbose_name='Инструмент'),
+        ),
+        migrations.AddField(
+            model_name='future',
+            name='instrument',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_detail', to='core.instrument', verbose_name='Инструмент'),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='instrument',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_detail', to='core.instrument', verbose_name='Инструмент'),
+        ),
+    ]
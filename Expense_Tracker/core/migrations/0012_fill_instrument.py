@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# Тип инструмента -> модель с его подробными полями
+DETAIL_MODELS = {
+    'share': 'Stock',
+    'bond': 'Bond',
+    'etf': 'Etf',
+    'currency': 'Currency',
+    'future': 'Future',
+}
+
+
+def fill_instruments(apps, schema_editor):
+    """
+    Заполняет единый реестр Instrument из таблиц инструментов и связывает их с ним.
+    """
+    Instrument = apps.get_model('core', 'Instrument')
+    for kind, model_name in DETAIL_MODELS.items():
+        model = apps.get_model('core', model_name)
+        details = list(model.objects.filter(instrument__isnull=True))
+        Instrument.objects.bulk_create(
+            [
+                Instrument(
+                    figi=d.figi, ticker=d.ticker, type=kind, name=d.name,
+                    currency=d.currency, lot=d.lot, is_active=d.is_active,
+                )
+                for d in details
+            ],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        ids = dict(Instrument.objects.filter(type=kind).values_list('figi', 'pk'))
+        for d in details:
+            d.instrument_id = ids.get(d.figi)
+        model.objects.bulk_update(details, ['instrument'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_instrument'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_instruments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_fill_instrument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=1, verbose_name='Версия')),
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_version', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Версия транзакций',
+                'verbose_name_plural': 'Версии транзакций',
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_transactionversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(verbose_name='Период')),
+                ('category', models.CharField(blank=True, max_length=50, verbose_name='Категория')),
+                ('currency', models.CharField(max_length=3, verbose_name='Валюта')),
+                ('spent', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Расходы')),
+                ('expenses', models.PositiveIntegerField(default=0, verbose_name='Расходных операций')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Операций')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Расходы за день',
+                'verbose_name_plural': 'Расходы по дням',
+                'constraints': [models.UniqueConstraint(fields=('author', 'period', 'category', 'currency'), name='unique_daily_spending')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlySpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(verbose_name='Период')),
+                ('category', models.CharField(blank=True, max_length=50, verbose_name='Категория')),
+                ('currency', models.CharField(max_length=3, verbose_name='Валюта')),
+                ('spent', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Расходы')),
+                ('expenses', models.PositiveIntegerField(default=0, verbose_name='Расходных операций')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Операций')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Расходы за месяц',
+                'verbose_name_plural': 'Расходы по месяцам',
+                'constraints': [models.UniqueConstraint(fields=('author', 'period', 'category', 'currency'), name='unique_monthly_spending')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+# Сводка -> период по дате операции
+ROLLUPS = {
+    'DailySpending': F('operation_date'),
+    'MonthlySpending': TruncMonth('operation_date'),
+}
+
+
+def fill_spending_rollups(apps, schema_editor):
+    """
+    Заполняет сводки расходов по уже загруженным транзакциям.
+    """
+    Transaction = apps.get_model('core', 'Transaction')
+    expense = Q(amount__lt=0)
+    for model_name, period in ROLLUPS.items():
+        model = apps.get_model('core', model_name)
+        rows = (
+            Transaction.objects.order_by()
+            .annotate(period=period)
+            .values('author', 'period', 'category', 'currency')
+            .annotate(spent=Sum('amount', filter=expense), expenses=Count('pk', filter=expense), count=Count('pk'))
+        )
+        model.objects.bulk_create(
+            [
+                model(
+                    author_id=row['author'], period=row['period'], category=row['category'],
+                    currency=row['currency'], spent=row['spent'] or 0,
+                    expenses=row['expenses'], count=row['count'],
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_spending_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_spending_rollups, migrations.RunPython.noop),
+    ]
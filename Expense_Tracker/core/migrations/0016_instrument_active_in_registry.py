@@ -0,0 +1,82 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+# Тип инструмента -> модель с его подробными полями
+DETAIL_MODELS = {
+    'share': 'Stock',
+    'bond': 'Bond',
+    'etf': 'Etf',
+    'currency': 'Currency',
+    'future': 'Future',
+}
+
+
+def move_active_to_registry(apps, schema_editor):
+    """
+    Переносит признак "торгуется" и дату исключения из таблиц типов в реестр Instrument.
+    """
+    Instrument = apps.get_model('core', 'Instrument')
+    for kind, model_name in DETAIL_MODELS.items():
+        model = apps.get_model('core', model_name)
+        Instrument.objects.filter(type=kind, figi__in=model.objects.filter(is_active=True).values('figi')).update(
+            is_active=True, removed_at=None,
+        )
+        for figi, removed_at in model.objects.filter(is_active=False).values_list('figi', 'removed_at'):
+            Instrument.objects.filter(figi=figi).update(is_active=False, removed_at=removed_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_fill_spending_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instrument',
+            name='removed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Исключен из каталога'),
+        ),
+        migrations.RunPython(move_active_to_registry, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='bond',
+            name='is_active',
+        ),
+        migrations.RemoveField(
+            model_name='bond',
+            name='removed_at',
+        ),
+        migrations.RemoveField(
+            model_name='currency',
+            name='is_active',
+        ),
+        migrations.RemoveField(
+            model_name='currency',
+            name='removed_at',
+        ),
+        migrations.RemoveField(
+            model_name='etf',
+            name='is_active',
+        ),
+        migrations.RemoveField(
+            model_name='etf',
+            name='removed_at',
+        ),
+        migrations.RemoveField(
+            model_name='future',
+            name='is_active',
+        ),
+        migrations.RemoveField(
+            model_name='future',
+            name='removed_at',
+        ),
+        migrations.RemoveField(
+            model_name='stock',
+            name='is_active',
+        ),
+        migrations.RemoveField(
+            model_name='stock',
+            name='removed_at',
+        ),
+    ]
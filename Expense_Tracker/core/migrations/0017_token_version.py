@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_instrument_active_in_registry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token_hash', models.CharField(max_length=64, unique=True, verbose_name='Хэш токена')),
+                ('version', models.PositiveIntegerField(default=1, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия проверки токена',
+                'verbose_name_plural': 'Версии проверки токенов',
+            },
+        ),
+    ]
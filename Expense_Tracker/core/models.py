@@ -34,7 +34,147 @@ class Transaction(models.Model):
 
 from django.db import models
 
-class Stock(models.Model):
+class TransactionVersion(models.Model):
+    """
+    Версия данных транзакций пользователя. Увеличивается при загрузке и удалении
+    транзакций и входит в ключ кэша графиков, поэтому старые графики просто перестают читаться.
+    """
+    author = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, related_name='transaction_version')
+    version = models.PositiveIntegerField(default=1, verbose_name="Версия")
+
+    class Meta:
+        verbose_name = "Версия транзакций"
+        verbose_name_plural = "Версии транзакций"
+
+
+class TokenVersion(models.Model):
+    """
+    Версия проверки токена Tinkoff Invest API (по хэшу токена). Увеличивается при сохранении
+    токена и входит в ключ кэша проверки, поэтому старый результат перестает читаться во всех процессах.
+    """
+    token_hash = models.CharField(max_length=64, unique=True, verbose_name="Хэш токена")
+    version = models.PositiveIntegerField(default=1, verbose_name="Версия")
+
+    class Meta:
+        verbose_name = "Версия проверки токена"
+        verbose_name_plural = "Версии проверки токенов"
+
+
+class SpendingRollup(models.Model):
+    """
+    Сводка транзакций пользователя за период по категории и валюте. Ведется
+    инкрементально при загрузке и удалении транзакций (core.rollups), поэтому графики
+    страницы транзакций читают несколько тысяч строк сводки вместо всей истории.
+    """
+    author = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='+')
+    period = models.DateField(verbose_name="Период")
+    category = models.CharField(max_length=50, blank=True, verbose_name="Категория")
+    currency = models.CharField(max_length=3, verbose_name="Валюта")
+    spent = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Расходы")
+    expenses = models.PositiveIntegerField(default=0, verbose_name="Расходных операций")
+    count = models.PositiveIntegerField(default=0, verbose_name="Операций")
+
+    def __str__(self):
+        return f"{self.period} {self.category} {self.currency}: {self.spent}"
+
+    class Meta:
+        abstract = True
+
+
+class DailySpending(SpendingRollup):
+    class Meta:
+        verbose_name = "Расходы за день"
+        verbose_name_plural = "Расходы по дням"
+        constraints = [
+            models.UniqueConstraint(fields=['author', 'period', 'category', 'currency'], name='unique_daily_spending'),
+        ]
+
+
+class MonthlySpending(SpendingRollup):
+    """
+    period — первое число месяца.
+    """
+    class Meta:
+        verbose_name = "Расходы за месяц"
+        verbose_name_plural = "Расходы по месяцам"
+        constraints = [
+            models.UniqueConstraint(fields=['author', 'period', 'category', 'currency'], name='unique_monthly_spending'),
+        ]
+
+
+class Instrument(models.Model):
+    """
+    Единый реестр инструментов всех типов: любой FIGI находится одним запросом
+    по индексу, а пачка FIGI — одним запросом с IN (Instrument.objects.in_bulk(figis, field_name='figi')).
+    Поля конкретного типа лежат в таблицах Stock, Bond, Etf, Currency, Future (свойство detail).
+    """
+    SHARE = 'share'
+    BOND = 'bond'
+    ETF = 'etf'
+    CURRENCY = 'currency'
+    FUTURE = 'future'
+    TYPE_CHOICES = [
+        (SHARE, "Акция"),
+        (BOND, "Облигация"),
+        (ETF, "Фонд"),
+        (CURRENCY, "Валюта"),
+        (FUTURE, "Фьючерс"),
+    ]
+
+    figi = models.CharField(max_length=12, unique=True, verbose_name="FIGI")
+    ticker = models.CharField(max_length=20, db_index=True, verbose_name="Тикер")
+    type = models.CharField(max_length=10, choices=TYPE_CHOICES, verbose_name="Тип")
+    name = models.CharField(max_length=255, verbose_name="Название")
+    currency = models.CharField(max_length=3, verbose_name="Валюта")
+    lot = models.IntegerField(blank=True, null=True, verbose_name="Лотность")
+    # Единственный признак "торгуется": таблицы типов его не дублируют
+    is_active = models.BooleanField(default=True, verbose_name="Торгуется")
+    removed_at = models.DateTimeField(blank=True, null=True, verbose_name="Исключен из каталога")
+
+    def __str__(self):
+        return f"{self.ticker} - {self.name}"
+
+    @property
+    def detail(self):
+        """
+        Строка таблицы конкретного типа (Stock, Bond, ...).
+        """
+        return getattr(self, f"{DETAIL_MODELS[self.type]}_detail", None)
+
+    class Meta:
+        verbose_name = "Инструмент"
+        verbose_name_plural = "Инструменты"
+        indexes = [
+            models.Index(fields=['type', 'is_active']),
+        ]
+
+
+# Тип инструмента -> имя модели с его подробными полями
+DETAIL_MODELS = {
+    Instrument.SHARE: 'stock',
+    Instrument.BOND: 'bond',
+    Instrument.ETF: 'etf',
+    Instrument.CURRENCY: 'currency',
+    Instrument.FUTURE: 'future',
+}
+
+
+class SyncedInstrument(models.Model):
+    """
+    Поля, которые ведет синхронизация каталога инструментов с Tinkoff Invest API.
+    Торгуется ли инструмент, хранится только в реестре (instrument.is_active).
+    """
+    instrument = models.OneToOneField(
+        Instrument, on_delete=models.CASCADE, blank=True, null=True,
+        related_name='%(class)s_detail', verbose_name="Инструмент"
+    )
+    content_hash = models.CharField(max_length=64, blank=True, verbose_name="Хэш данных")
+
+    class Meta:
+        abstract = True
+
+
+class Stock(SyncedInstrument):
     figi = models.CharField(max_length=12, unique=True, verbose_name="FIGI")
     ticker = models.CharField(max_length=10, verbose_name="Тикер")
     name = models.CharField(max_length=255, verbose_name="Название компании")
@@ -56,13 +196,14 @@ class Stock(models.Model):
         verbose_name_plural = "Акции"
 
 
-class Bond(models.Model):
+class Bond(SyncedInstrument):
     figi = models.CharField(max_length=12, unique=True, verbose_name="FIGI")
     ticker = models.CharField(max_length=10, verbose_name="Тикер")
     name = models.CharField(max_length=255, verbose_name="Название облигации")
     currency = models.CharField(max_length=3, verbose_name="Валюта")
     maturity_date = models.DateField(verbose_name="Дата погашения")
     nominal = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Номинал")
+    lot = models.IntegerField(default=1, verbose_name="Лотность")
     coupon_quantity_per_year = models.IntegerField(verbose_name="Количество купонов в год")
     floating_coupon_flag = models.BooleanField(default=False, verbose_name="Плавающий купон")
     perpetual_flag = models.BooleanField(default=False, verbose_name="Бессрочная облигация")
@@ -78,4 +219,126 @@ class Bond(models.Model):
         verbose_name_plural = "Облигации"
 
 
+class Etf(SyncedInstrument):
+    figi = models.CharField(max_length=12, unique=True, verbose_name="FIGI")
+    ticker = models.CharField(max_length=20, verbose_name="Тикер")
+    name = models.CharField(max_length=255, verbose_name="Название фонда")
+    currency = models.CharField(max_length=3, verbose_name="Валюта")
+    focus_type = models.CharField(max_length=50, blank=True, verbose_name="Фокус инвестиций")
+    sector = models.CharField(max_length=100, blank=True, null=True, verbose_name="Сектор")
+    country_of_risk = models.CharField(max_length=2, blank=True, verbose_name="Код страны риска")
+    exchange = models.CharField(max_length=50, verbose_name="Торговая площадка")
+    lot = models.IntegerField(verbose_name="Лотность")
+    trading_status = models.CharField(max_length=50, verbose_name="Режим торгов")
+
+    def __str__(self):
+        return f"{self.ticker} - {self.name}"
+
+    class Meta:
+        verbose_name = "Фонд"
+        verbose_name_plural = "Фонды"
+
+
+class Currency(SyncedInstrument):
+    figi = models.CharField(max_length=12, unique=True, verbose_name="FIGI")
+    ticker = models.CharField(max_length=20, verbose_name="Тикер")
+    name = models.CharField(max_length=255, verbose_name="Название валюты")
+    currency = models.CharField(max_length=3, verbose_name="Валюта расчетов")
+    iso_currency_name = models.CharField(max_length=3, verbose_name="Код валюты ISO")
+    exchange = models.CharField(max_length=50, verbose_name="Торговая площадка")
+    lot = models.IntegerField(verbose_name="Лотность")
+    nominal = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, verbose_name="Номинал")
+    trading_status = models.CharField(max_length=50, verbose_name="Режим торгов")
+
+    def __str__(self):
+        return f"{self.ticker} - {self.name}"
+
+    class Meta:
+        verbose_name = "Валюта"
+        verbose_name_plural = "Валюты"
+
+
+class Future(SyncedInstrument):
+    figi = models.CharField(max_length=12, unique=True, verbose_name="FIGI")
+    ticker = models.CharField(max_length=20, verbose_name="Тикер")
+    name = models.CharField(max_length=255, verbose_name="Название фьючерса")
+    currency = models.CharField(max_length=3, verbose_name="Валюта")
+    futures_type = models.CharField(max_length=50, blank=True, verbose_name="Тип фьючерса")
+    asset_type = models.CharField(max_length=50, blank=True, verbose_name="Тип базового актива")
+    basic_asset = models.CharField(max_length=100, blank=True, verbose_name="Базовый актив")
+    expiration_date = models.DateField(blank=True, null=True, verbose_name="Дата экспирации")
+    exchange = models.CharField(max_length=50, verbose_name="Торговая площадка")
+    lot = models.IntegerField(verbose_name="Лотность")
+    trading_status = models.CharField(max_length=50, verbose_name="Режим торгов")
+
+    def __str__(self):
+        return f"{self.ticker} - {self.name}"
+
+    class Meta:
+        verbose_name = "Фьючерс"
+        verbose_name_plural = "Фьючерсы"
+
+
 from django.db import models
+
+
+class Candle(models.Model):
+    figi = models.CharField(max_length=12, verbose_name="FIGI")
+    interval = models.PositiveIntegerField(verbose_name="Интервал (мин)")
+    time = models.DateTimeField(verbose_name="Время открытия")
+    open = models.FloatField(verbose_name="Цена открытия")
+    high = models.FloatField(verbose_name="Максимальная цена")
+    low = models.FloatField(verbose_name="Минимальная цена")
+    close = models.FloatField(verbose_name="Цена закрытия")
+    volume = models.BigIntegerField(verbose_name="Объем")
+
+    def __str__(self):
+        return f"{self.figi} {self.interval}m {self.time}"
+
+    class Meta:
+        verbose_name = "Свеча"
+        verbose_name_plural = "Свечи"
+        constraints = [
+            models.UniqueConstraint(fields=['figi', 'interval', 'time'], name='unique_candle'),
+        ]
+
+
+class CandleRange(models.Model):
+    """
+    Диапазон времени, свечи за который уже загружены из API.
+    Нужен, чтобы отличать "данных нет" (выходные, ночь) от "данные не загружались".
+    """
+    figi = models.CharField(max_length=12, verbose_name="FIGI")
+    interval = models.PositiveIntegerField(verbose_name="Интервал (мин)")
+    start = models.DateTimeField(verbose_name="Начало")
+    end = models.DateTimeField(verbose_name="Конец")
+
+    def __str__(self):
+        return f"{self.figi} {self.interval}m [{self.start} - {self.end})"
+
+    class Meta:
+        verbose_name = "Загруженный диапазон свечей"
+        verbose_name_plural = "Загруженные диапазоны свечей"
+        indexes = [
+            models.Index(fields=['figi', 'interval', 'start']),
+        ]
+
+
+class InstrumentSyncRun(models.Model):
+    """
+    Итог одного запуска синхронизации каталога инструментов (fill_instruments).
+    """
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name="Начало")
+    duration = models.FloatField(default=0, verbose_name="Длительность (с)")
+    inserted = models.PositiveIntegerField(default=0, verbose_name="Добавлено")
+    updated = models.PositiveIntegerField(default=0, verbose_name="Обновлено")
+    unchanged = models.PositiveIntegerField(default=0, verbose_name="Без изменений")
+    removed = models.PositiveIntegerField(default=0, verbose_name="Исключено")
+
+    def __str__(self):
+        return f"{self.started_at}: +{self.inserted} ~{self.updated} -{self.removed}"
+
+    class Meta:
+        verbose_name = "Синхронизация каталога"
+        verbose_name_plural = "Синхронизации каталога"
+        ordering = ['-started_at']
@@ -0,0 +1,71 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Ключ "счета" под которым хранится список счетов токена
+ACCOUNTS_KEY = '__accounts__'
+
+
+class PortfolioCache:
+    """
+    Кэш снимков портфеля по паре (токен, счет) с TTL.
+
+    Данные лежат в кэше Django; сброс всех снимков токена делается
+    увеличением версии токена, поэтому не требует перебора ключей.
+    """
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.PORTFOLIO_CACHE_TTL
+
+    @staticmethod
+    def _token_hash(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _version(self, token):
+        return cache.get_or_set(f'portfolio_version:{self._token_hash(token)}', 1, None)
+
+    def _key(self, token, account_id):
+        return f'portfolio:{self._token_hash(token)}:{self._version(token)}:{account_id}'
+
+    def get(self, token, account_id):
+        """
+        Возвращает снимок из кэша или None.
+        """
+        return cache.get(self._key(token, account_id))
+
+    def set(self, token, account_id, value):
+        cache.set(self._key(token, account_id), value, self.ttl)
+
+    def get_or_fetch(self, token, account_id, fetch):
+        """
+        Возвращает снимок из кэша, а при промахе вызывает fetch() и кэширует результат.
+        None (ошибка загрузки) не кэшируется.
+        """
+        value = self.get(token, account_id)
+        if value is None:
+            value = fetch()
+            if value is not None:
+                self.set(token, account_id, value)
+        return value
+
+    def invalidate(self, token, account_id=None):
+        """
+        Сбрасывает снимок счета, а без account_id — все снимки токена.
+        """
+        if not token:
+            return
+        if account_id is not None:
+            cache.delete(self._key(token, account_id))
+            return
+        version_key = f'portfolio_version:{self._token_hash(token)}'
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, 2, None)
+
+
+portfolio_cache = PortfolioCache()
@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import random
+import sqlite3
+import threading
+import time
+
+import grpc
+from django.conf import settings
+
+
+def service_of(method):
+    """
+    Имя сервиса из имени gRPC-метода:
+    '/tinkoff.public.invest.api.contract.v1.MarketDataService/GetCandles' -> 'MarketDataService'.
+    """
+    if isinstance(method, bytes):
+        method = method.decode()
+    return method.strip('/').split('/')[0].rsplit('.', 1)[-1]
+
+
+def token_from_metadata(metadata):
+    for key, value in metadata or ():
+        if key == 'authorization':
+            return value.split(' ', 1)[-1]
+    return ''
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket на токен и сервис API. Состояние хранится в SQLite-файле,
+    поэтому лимит общий для всех процессов (воркеров gunicorn) на сервере.
+    """
+    def __init__(self, path=None, limits=None):
+        self._path = str(path or settings.TINKOFF_RATE_LIMIT_DB)
+        self._limits = limits or settings.TINKOFF_RATE_LIMITS
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def _limit(self, service):
+        return self._limits.get(service, self._limits['default'])
+
+    def try_acquire(self, token, service):
+        """
+        Пытается взять токен из корзины. Возвращает 0, если удалось,
+        иначе — сколько секунд ждать до появления токена.
+        """
+        capacity = float(self._limit(service))
+        rate = capacity / 60  # лимиты API заданы в запросах в минуту
+        key = hashlib.sha256(token.encode()).hexdigest()[:16] + ':' + service
+
+        conn = self._connection()
+        # BEGIN IMMEDIATE блокирует файл на запись — другие процессы ждут
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def acquire(self, token, service):
+        """
+        Блокирует поток, пока квота сервиса для токена не позволит сделать запрос.
+        """
+        while True:
+            wait = self.try_acquire(token, service)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class Scheduler:
+    """
+    Пропускает вызовы API через лимитер и повторяет их с экспоненциальной
+    задержкой со случайным разбросом, если API ответил RESOURCE_EXHAUSTED.
+    """
+    def __init__(self, limiter=None, attempts=None, base_delay=None, max_delay=None):
+        self._limiter = limiter
+        self._attempts = attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+
+    @property
+    def limiter(self):
+        if self._limiter is None:
+            self._limiter = TokenBucketLimiter()
+        return self._limiter
+
+    @property
+    def attempts(self):
+        return self._attempts if self._attempts is not None else settings.TINKOFF_RETRY_ATTEMPTS
+
+    def backoff(self, attempt, reset=None):
+        """
+        Задержка перед повтором: base * 2^attempt со случайным множителем,
+        но не меньше, чем до сброса лимита, о котором сообщил сервер.
+        """
+        base = self._base_delay if self._base_delay is not None else settings.TINKOFF_RETRY_BASE_DELAY
+        cap = self._max_delay if self._max_delay is not None else settings.TINKOFF_RETRY_MAX_DELAY
+        delay = min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.5)
+        return max(delay, float(reset or 0))
+
+    def call(self, token, method, invoke):
+        """
+        Выполняет синхронный gRPC-вызов. invoke() возвращает результат continuation
+        из интерсептора; ошибка в нем не выбрасывается, а доступна через code().
+        """
+        service = service_of(method)
+        for attempt in range(self.attempts):
+            self.limiter.acquire(token, service)
+            outcome = invoke()
+            if outcome.code() != grpc.StatusCode.RESOURCE_EXHAUSTED or attempt == self.attempts - 1:
+                return outcome
+            reset = dict(outcome.trailing_metadata() or ()).get('x-ratelimit-reset')
+            time.sleep(self.backoff(attempt, reset))
+
+    async def call_async(self, token, method, make_call):
+        """
+        То же для AsyncClient: make_call() возвращает корутину вызова API.
+        """
+        service = service_of(method)
+        for attempt in range(self.attempts):
+            await asyncio.to_thread(self.limiter.acquire, token, service)
+            try:
+                return await make_call()
+            except Exception as e:
+                if getattr(e, 'code', None) != grpc.StatusCode.RESOURCE_EXHAUSTED or attempt == self.attempts - 1:
+                    raise
+                reset = getattr(getattr(e, 'metadata', None), 'ratelimit_reset', None)
+                await asyncio.sleep(self.backoff(attempt, reset))
+
+
+class RateLimitInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """
+    Интерсептор канала: каждый unary-вызов Tinkoff Invest API идет через планировщик.
+    """
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        token = token_from_metadata(client_call_details.metadata)
+        return self._scheduler.call(
+            token,
+            client_call_details.method,
+            lambda: continuation(client_call_details, request)
+        )
+
+
+scheduler = Scheduler()
@@ -0,0 +1,184 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import DailySpending, MonthlySpending, Transaction
+
+# Расходы — операции с отрицательной суммой
+EXPENSE = Q(amount__lt=0)
+
+# Поля транзакции, по которым обновляются сводки
+ROW_FIELDS = ('operation_date', 'category', 'currency', 'amount')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+# Сводная таблица -> (период по дате операции в Python, то же выражение в SQL)
+ROLLUPS = {
+    DailySpending: (lambda day: day, F('operation_date')),
+    MonthlySpending: (month_start, TruncMonth('operation_date')),
+}
+
+
+def rollup_deltas(rows, period):
+    """
+    Сворачивает строки транзакций (ROW_FIELDS) в изменения сводки:
+    {(период, категория, валюта): [расходы, расходных операций, операций]}.
+    """
+    deltas = defaultdict(lambda: [Decimal(0), 0, 0])
+    for operation_date, category, currency, amount in rows:
+        amount = Decimal(str(amount))
+        delta = deltas[(period(operation_date), category, currency)]
+        if amount < 0:
+            delta[0] += amount
+            delta[1] += 1
+        delta[2] += 1
+    return deltas
+
+
+def update_rollups(user, rows, sign=1):
+    """
+    Применяет к сводкам пользователя добавленные (sign=1) или удаленные (sign=-1) транзакции.
+    Вызывается в той же транзакции БД, что и изменение Transaction.
+
+    :param user: Владелец транзакций.
+    :param rows: Кортежи полей ROW_FIELDS.
+    :param sign: 1 — транзакции добавлены, -1 — удалены.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    with transaction.atomic():
+        for model, (period, _) in ROLLUPS.items():
+            deltas = rollup_deltas(rows, period)
+            periods = [key[0] for key in deltas]
+            existing = {
+                (rollup.period, rollup.category, rollup.currency): rollup
+                for rollup in model.objects.select_for_update().filter(
+                    author=user, period__gte=min(periods), period__lte=max(periods)
+                )
+            }
+
+            created, updated, removed = [], [], []
+            for key, (spent, expenses, count) in deltas.items():
+                rollup = existing.get(key)
+                if rollup is None:
+                    if sign < 0:
+                        continue  # Сводка уже не содержит этих транзакций
+                    rollup = model(author=user, period=key[0], category=key[1], currency=key[2])
+                    created.append(rollup)
+                elif rollup.count + sign * count <= 0:
+                    removed.append(rollup.pk)
+                    continue
+                else:
+                    updated.append(rollup)
+                rollup.spent += sign * spent
+                rollup.expenses = max(rollup.expenses + sign * expenses, 0)
+                rollup.count += sign * count
+
+            model.objects.bulk_create(created, batch_size=1000)
+            model.objects.bulk_update(updated, ['spent', 'expenses', 'count'], batch_size=1000)
+            model.objects.filter(pk__in=removed).delete()
+
+
+def add_transactions(user, transactions):
+    """
+    Сохраняет новые транзакции пользователя и обновляет его сводки.
+    """
+    with transaction.atomic():
+        Transaction.objects.bulk_create(transactions)
+        update_rollups(user, ((t.operation_date, t.category, t.currency, t.amount) for t in transactions))
+
+
+def delete_transactions(user, queryset):
+    """
+    Удаляет транзакции пользователя из queryset и вычитает их из сводок.
+    """
+    with transaction.atomic():
+        queryset = queryset.filter(author=user)
+        rows = list(queryset.select_for_update().values_list(*ROW_FIELDS))
+        queryset.delete()
+        update_rollups(user, rows, sign=-1)
+
+
+def delete_all_transactions(user):
+    """
+    Удаляет все транзакции пользователя вместе со сводками.
+    """
+    with transaction.atomic():
+        Transaction.objects.filter(author=user).delete()
+        for model in ROLLUPS:
+            model.objects.filter(author=user).delete()
+
+
+def expected_rollups(model, user=None):
+    """
+    Сводка, посчитанная заново по таблице транзакций:
+    {(id автора, период, категория, валюта): (расходы, расходных операций, операций)}.
+    """
+    _, period = ROLLUPS[model]
+    queryset = Transaction.objects.all() if user is None else Transaction.objects.filter(author=user)
+    rows = (
+        queryset.order_by()
+        .annotate(period=period)
+        .values('author', 'period', 'category', 'currency')
+        .annotate(spent=Sum('amount', filter=EXPENSE), expenses=Count('pk', filter=EXPENSE), count=Count('pk'))
+        .values_list('author', 'period', 'category', 'currency', 'spent', 'expenses', 'count')
+    )
+    return {
+        (author, period, category, currency): (spent or Decimal(0), expenses, count)
+        for author, period, category, currency, spent, expenses, count in rows
+    }
+
+
+def stored_rollups(model, user=None):
+    queryset = model.objects.all() if user is None else model.objects.filter(author=user)
+    return {
+        (author, period, category, currency): (spent, expenses, count)
+        for author, period, category, currency, spent, expenses, count in queryset.values_list(
+            'author', 'period', 'category', 'currency', 'spent', 'expenses', 'count'
+        )
+    }
+
+
+def rebuild_rollups(user=None):
+    """
+    Пересчитывает сводки пользователя (без user — всех) по таблице транзакций.
+    :return: Число строк в каждой сводке {модель: строк}.
+    """
+    result = {}
+    with transaction.atomic():
+        for model in ROLLUPS:
+            expected = expected_rollups(model, user)
+            (model.objects.all() if user is None else model.objects.filter(author=user)).delete()
+            model.objects.bulk_create(
+                [
+                    model(author_id=author, period=period, category=category, currency=currency,
+                          spent=spent, expenses=expenses, count=count)
+                    for (author, period, category, currency), (spent, expenses, count) in expected.items()
+                ],
+                batch_size=1000,
+            )
+            result[model] = len(expected)
+    return result
+
+
+def check_rollups(user=None):
+    """
+    Сравнивает сводки с пересчетом по таблице транзакций.
+    :return: Список расхождений (модель, ключ, ожидаемое значение, сохраненное значение);
+        None вместо значения — строки нет.
+    """
+    mismatches = []
+    for model in ROLLUPS:
+        expected = expected_rollups(model, user)
+        stored = stored_rollups(model, user)
+        for key in expected.keys() | stored.keys():
+            if expected.get(key) != stored.get(key):
+                mismatches.append((model, key, expected.get(key), stored.get(key)))
+    return mismatches
@@ -1,36 +1,127 @@
+// Ленивая отрисовка графиков: JSON графика запрашивается, когда блок попадает на экран
+document.addEventListener('DOMContentLoaded', function () {
+    const charts = document.querySelectorAll('.lazy-chart');
+    if (!charts.length) {
+        return;
+    }
+
+    function render(element) {
+        fetch(element.dataset.chartUrl)
+            .then(response => response.json())
+            .then(spec => {
+                if (spec.error) {
+                    element.innerHTML = '';
+                    const message = document.createElement('div');
+                    message.className = 'alert alert-danger';
+                    message.textContent = spec.error;
+                    element.appendChild(message);
+                    return;
+                }
+                Plotly.newPlot(element, spec.data, spec.layout, {responsive: true});
+            })
+            .catch(error => console.error(error));
+    }
+
+    // Скрытые блоки (d-none) не пересекают экран и загрузятся, только когда их покажут
+    const observer = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                render(entry.target);
+            }
+        });
+    }, {rootMargin: '200px'});
+
+    charts.forEach(chart => observer.observe(chart));
+});
+
 document.addEventListener('DOMContentLoaded', function () {
     const searchInput = document.getElementById('asset-search');
+    if (!searchInput) {
+        return;
+    }
     const stockFigi = document.getElementById('stock_figi');
     const bondFigi = document.getElementById('bond_figi');
+    const stockResults = document.getElementById('stock-results');
+    const bondResults = document.getElementById('bond-results');
+    const searchUrl = searchInput.dataset.searchUrl;
 
-    // Обработка клика на элемент списка
-    document.querySelectorAll('.asset-item').forEach(item => {
-        item.addEventListener('click', function () {
-            const type = this.dataset.type;
-            const value = this.dataset.value;
-            const text = this.textContent.trim(); // Удаляем пробелы
-
-            // Обновляем поле ввода и скрытые поля
-            searchInput.value = text; // Без пробелов
-            if (type === 'stock') {
-                stockFigi.value = value;
-                bondFigi.value = ''; // Очищаем другое поле
-            } else {
-                bondFigi.value = value;
-                stockFigi.value = ''; // Очищаем другое поле
-            }
+    let timer = null;
+    let controller = null;
 
-            // Скрываем выпадающий список
-            bootstrap.Dropdown.getInstance(searchInput).hide();
-        });
+    // Обработка клика на элемент списка (в том числе добавленный поиском)
+    document.addEventListener('click', function (event) {
+        const item = event.target.closest('.asset-item');
+        if (!item) {
+            return;
+        }
+        const type = item.dataset.type;
+        const value = item.dataset.value;
+        const text = item.textContent.trim(); // Удаляем пробелы
+
+        // Обновляем поле ввода и скрытые поля
+        searchInput.value = text; // Без пробелов
+        if (type === 'stock') {
+            stockFigi.value = value;
+            bondFigi.value = ''; // Очищаем другое поле
+        } else {
+            bondFigi.value = value;
+            stockFigi.value = ''; // Очищаем другое поле
+        }
+
+        // Скрываем выпадающий список
+        bootstrap.Dropdown.getInstance(searchInput).hide();
     });
 
-    // Фильтрация при вводе текста
+    function makeItem(instrument, type) {
+        const button = document.createElement('button');
+        button.type = 'button';
+        button.className = 'dropdown-item asset-item text-truncate';
+        button.dataset.type = type;
+        button.dataset.value = instrument.figi;
+        button.textContent = `${instrument.name} (${instrument.figi})`;
+        return button;
+    }
+
+    // Запрос к поиску на сервере; предыдущий незавершенный запрос отменяется
+    function search(term) {
+        if (controller) {
+            controller.abort();
+        }
+        stockResults.replaceChildren();
+        bondResults.replaceChildren();
+        if (!term) {
+            return;
+        }
+        controller = new AbortController();
+        const params = new URLSearchParams({q: term, type: 'share,bond'});
+        fetch(`${searchUrl}?${params}`, {signal: controller.signal})
+            .then(response => response.json())
+            .then(data => {
+                data.results.forEach(instrument => {
+                    if (instrument.type === 'share') {
+                        stockResults.appendChild(makeItem(instrument, 'stock'));
+                    } else {
+                        bondResults.appendChild(makeItem(instrument, 'bond'));
+                    }
+                });
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    console.error(error);
+                }
+            });
+    }
+
+    // Фильтрация активов из портфеля и поиск по всему каталогу при вводе текста
     searchInput.addEventListener('input', function () {
         const searchTerm = this.value.toLowerCase().trim(); // Удаляем пробелы
-        document.querySelectorAll('.asset-item').forEach(item => {
+        document.querySelectorAll('.owned-item').forEach(item => {
             const text = item.textContent.toLowerCase();
             item.style.display = text.includes(searchTerm) ? 'block' : 'none';
         });
+
+        clearTimeout(timer);
+        timer = setTimeout(() => search(searchTerm), 250);
     });
-});
\ No newline at end of file
+});
@@ -1,3 +1,738 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import tempfile
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import grpc
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from tinkoff.invest import RequestError
+
+from . import candles, rate_limit
+from .chart_cache import chart_cache, get_transactions_version, normalize_filters
+from .downsampling import downsample_line, downsample_ohlc, lttb
+from .functions import portfolio_to_frame
+from .fx import CURRENCY_FIGIS, convert, get_cached_rates, get_rates, rate_figis, rates_from_last_prices, store_rates
+from .instrument_search import InstrumentSearchIndex
+from .instrument_sync import sync_catalog
+from .models import (
+    CandleRange, Currency, DailySpending, Instrument, InstrumentSyncRun, MonthlySpending, Stock, Transaction,
+)
+from .rollups import add_transactions, check_rollups, delete_all_transactions, delete_transactions
+from .tinkoff_pool import ChannelPool
+from .transaction_charts import transaction_figure
+from .tokens import invalidate_token, is_token_valid
+
+
+class TransactionListViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='user', password='password')
+        start = date(2024, 1, 1)
+        add_transactions(self.user, [
+            Transaction(
+                operation_date=start + timedelta(days=i), currency='RUB', category=('Еда', 'Такси')[i % 2],
+                description=f'Операция {i}', bonuses=0, amount=-100 - i, author=self.user,
+            )
+            for i in range(60)
+        ])
+        self.client.force_login(self.user)
+
+    def test_query_count(self):
+        # Сессия и пользователь, категории, COUNT и одна страница транзакций
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('transaction_list'))
+        self.assertEqual(response.context['paginator'].count, 60)
+        self.assertEqual(response.context['categories'], ['Еда', 'Такси'])
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_query_count_with_filters(self):
+        params = {'start_date': '2024-01-11', 'end_date': '2024-01-30', 'category': 'Такси'}
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('transaction_list'), params)
+        self.assertEqual(response.context['paginator'].count, 10)
+        self.assertEqual(response.context['categories'], ['Еда', 'Такси'])
+        dates = [item['operation_date'] for item in response.context['page_obj']]
+        self.assertEqual(dates, [date(2024, 1, 30) - timedelta(days=2 * i) for i in range(10)])
+
+    def test_count_with_writes_bypassing_rollups(self):
+        # Запись мимо core.rollups (админка, shell) не должна ломать пагинацию
+        Transaction.objects.bulk_create([
+            Transaction(operation_date=date(2024, 1, 15), currency='RUB', category='Такси',
+                        description='Вне сводки', bonuses=0, amount=-1, author=self.user)
+            for _ in range(15)
+        ])
+        Transaction.objects.filter(author=self.user, category='Еда')[:1].get().delete()
+
+        params = {'start_date': '2024-01-11', 'end_date': '2024-01-30', 'category': 'Такси'}
+        response = self.client.get(reverse('transaction_list'), params)
+        expected = Transaction.objects.filter(
+            author=self.user, operation_date__gte='2024-01-11', operation_date__lte='2024-01-30', category='Такси',
+        ).count()
+        self.assertEqual(response.context['paginator'].count, expected)
+        self.assertEqual(response.context['paginator'].num_pages, 3)
+        self.assertEqual(response.context['categories'], ['Еда', 'Такси'])
+
+        # Категория, записанная мимо сводок, тоже попадает в выпадающий список
+        Transaction.objects.create(operation_date=date(2024, 1, 15), currency='RUB', category='Аптека',
+                                   description='Вне сводки', bonuses=0, amount=-1, author=self.user)
+        response = self.client.get(reverse('transaction_list'))
+        self.assertEqual(response.context['categories'], ['Аптека', 'Еда', 'Такси'])
+
+        # 60 + 15 - 1 + 1 = 75 строк: последняя, восьмая страница не пустая
+        response = self.client.get(reverse('transaction_list'), {'page': 8})
+        self.assertEqual(response.context['paginator'].count, Transaction.objects.filter(author=self.user).count())
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+
+class FxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_rub_without_rates(self):
+        self.assertEqual(convert([10, -5], ['RUB', 'rub'], None).tolist(), [10.0, -5.0])
+
+    def test_missing_rate_is_nan(self):
+        # Без курса не переводится только своя строка, остальные считаются
+        result = convert([10, 1, 2], ['usd', 'gbp', 'rub'], pd.Series({'rub': 1.0, 'usd': 90.0}))
+        self.assertEqual(result[[0, 2]].tolist(), [900.0, 2.0])
+        self.assertTrue(pd.isna(result[1]))
+        self.assertTrue(pd.isna(convert([10], ['USD'], None)[0]))
+
+    def test_convert(self):
+        rates = pd.Series({'rub': 1.0, 'usd': 90.0})
+        self.assertEqual(convert([2, 3], ['USD', 'RUB'], rates).tolist(), [180.0, 3.0])
+
+    def test_no_token_is_not_cached(self):
+        self.assertIsNone(get_rates(None))
+        self.assertIsNone(get_cached_rates())
+
+    def test_partial_rates_are_cached(self):
+        store_rates(pd.Series({'rub': 1.0, 'usd': 90.0}))
+        self.assertEqual(get_cached_rates().to_dict(), {'rub': 1.0, 'usd': 90.0})
+
+    def test_rate_figis_from_catalog(self):
+        for figi, ticker, code in [('BBG0013HQ5K4', 'GBPRUB_TOD', 'gbp'), ('BBG0013HQ5F0', 'GBPRUB_TOM', 'gbp'),
+                                   ('BBG0013HSY78', 'KZTRUB_TOM', 'kzt'), ('TCS0013HQ5K4', 'GBPKZT_TOM', 'gbp')]:
+            Currency.objects.create(
+                figi=figi, ticker=ticker, name=ticker, currency='kzt' if ticker.startswith('GBPKZT') else 'rub',
+                iso_currency_name=code, exchange='MOEX', lot=1, trading_status='NORMAL_TRADING',
+            )
+        figis = rate_figis()
+        self.assertEqual(figis['gbp'], 'BBG0013HQ5F0')
+        self.assertEqual(figis['kzt'], 'BBG0013HSY78')
+        self.assertEqual(figis['usd'], CURRENCY_FIGIS['usd'])
+
+        response = SimpleNamespace(last_prices=[
+            SimpleNamespace(figi='BBG0013HQ5F0', price=SimpleNamespace(units=115, nano=0)),
+            SimpleNamespace(figi=CURRENCY_FIGIS['usd'], price=SimpleNamespace(units=0, nano=0)),
+        ])
+        self.assertEqual(rates_from_last_prices(response, figis).to_dict(), {'rub': 1.0, 'gbp': 115.0})
+
+    def test_portfolio_marks_positions_without_rate(self):
+        def money(value, currency='rub'):
+            return SimpleNamespace(units=value, nano=0, currency=currency)
+
+        positions = [
+            SimpleNamespace(figi=figi, quantity=money(1), expected_yield=money(10), instrument_type='share',
+                            average_position_price=money(100, currency), current_nkd=money(0))
+            for figi, currency in [('A', 'usd'), ('B', 'gbp')]
+        ]
+        df = portfolio_to_frame(positions, pd.Series({'rub': 1.0, 'usd': 90.0}))
+        self.assertEqual(df['no_rate'].tolist(), [False, True])
+        self.assertEqual(df['average_buy_price'].tolist(), [9000.0, 100.0])
+
+    def test_chart_without_rates_skips_foreign_rows(self):
+        user = get_user_model().objects.create_user(username='user', password='password')
+        add_transactions(user, [
+            Transaction(operation_date=date(2024, 1, 1), currency=currency, category='Еда',
+                        description='', bonuses=0, amount=amount, author=user)
+            for currency, amount in [('RUB', -100), ('USD', -5), ('TRY', -7)]
+        ])
+        self.client.force_login(user)
+        response = self.client.get(reverse('transaction_chart', args=['pie']))
+        self.assertEqual(response.status_code, 200)
+        spec = json.loads(response.content)
+        self.assertEqual(spec['data'][0]['labels'], ['Еда'])
+        values = spec['data'][0]['values']
+        self.assertEqual(np.frombuffer(base64.b64decode(values['bdata']), dtype=values['dtype']).tolist(), [100.0])
+
+
+class TokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def client_factory(self, error=None):
+        client = mock.MagicMock()
+        if error is not None:
+            client.users.get_info.side_effect = error
+        return mock.patch('core.tokens.tinkoff_client', return_value=nullcontext(client))
+
+    def test_invalidation_is_shared_through_db(self):
+        with self.client_factory(RequestError(grpc.StatusCode.UNAUTHENTICATED)):
+            self.assertFalse(is_token_valid('token'))
+        with self.client_factory() as client:
+            self.assertFalse(is_token_valid('token'))
+        client.assert_not_called()
+
+        # Другой процесс сохранил токен: в нашем кэше старая запись, но ключ уже другой
+        invalidate_token('token')
+        with self.client_factory() as client:
+            self.assertTrue(is_token_valid('token'))
+        client.assert_called_once()
+
+    def test_network_error_is_not_cached(self):
+        with self.client_factory(RequestError(grpc.StatusCode.UNAVAILABLE)):
+            self.assertFalse(is_token_valid('token'))
+        with self.client_factory():
+            self.assertTrue(is_token_valid('token'))
+
+
+class ChartCacheTests(TestCase):
+    def setUp(self):
+        caches['charts'].clear()
+        self.user = get_user_model().objects.create_user(username='user', password='password')
+        add_transactions(self.user, [
+            Transaction(operation_date=date(2024, 1, 5), currency='RUB', category='Еда',
+                        description='Магазин', bonuses=0, amount=-100, author=self.user),
+        ])
+        self.client.force_login(self.user)
+
+    def test_normalized_dates_share_key(self):
+        self.assertEqual(normalize_filters({'start_date': '2024-1-5', 'page': '2', 'category': ''}),
+                         {'start_date': '2024-01-05'})
+        self.assertEqual(chart_cache.key(self.user, 'daily', {'start_date': '2024-1-5'}),
+                         chart_cache.key(self.user, 'daily', {'start_date': '2024-01-05'}))
+
+    def test_none_is_cached(self):
+        build = mock.Mock(return_value=None)
+        self.assertIsNone(chart_cache.get_or_build(self.user, 'daily', {}, build))
+        self.assertIsNone(chart_cache.get_or_build(self.user, 'daily', {}, build))
+        build.assert_called_once()
+
+    def test_upload_and_delete_miss_cache(self):
+        url = reverse('transaction_chart', args=['pie'])
+        with mock.patch('core.views.transaction_figure', wraps=transaction_figure) as build:
+            self.client.get(url)
+            self.client.get(url)
+            self.assertEqual(build.call_count, 1)
+
+            version = get_transactions_version(self.user)
+            upload = SimpleUploadedFile('operations.csv', (
+                'Дата,Карта,Валюта,Категория,MCC,Описание,Бонусы,Сумма\n'
+                '06.01.2024 10:00:00,1234,RUB,Такси,4121,Такси,0,-300\n'
+            ).encode())
+            self.client.post(reverse('upload_transactions'), {'file': upload})
+            self.assertEqual(get_transactions_version(self.user), version + 1)
+            labels = json.loads(self.client.get(url).content)['data'][0]['labels']
+            self.assertEqual(sorted(labels), ['Еда', 'Такси'])
+            self.assertEqual(build.call_count, 2)
+
+            transaction = Transaction.objects.get(author=self.user, category='Такси')
+            self.client.post(reverse('delete_transaction', args=[transaction.pk]))
+            self.assertEqual(get_transactions_version(self.user), version + 2)
+            labels = json.loads(self.client.get(url).content)['data'][0]['labels']
+            self.assertEqual(labels, ['Еда'])
+            self.assertEqual(build.call_count, 3)
+
+
+class SpendingRollupTests(TestCase):
+    def setUp(self):
+        users = get_user_model().objects
+        self.user = users.create_user(username='user', password='password')
+        self.other = users.create_user(username='other', password='password')
+
+    def transactions(self, user, count, start=date(2024, 1, 25)):
+        return [
+            Transaction(
+                operation_date=start + timedelta(days=i), currency=('RUB', 'USD')[i % 2],
+                category=('Еда', 'Такси', 'Кафе')[i % 3], description=f'Операция {i}',
+                bonuses=0, amount=(-100 - i, 50)[i % 4 == 0], author=user,
+            )
+            for i in range(count)
+        ]
+
+    def test_incremental_updates_match_rebuild(self):
+        add_transactions(self.user, self.transactions(self.user, 40))
+        add_transactions(self.other, self.transactions(self.other, 25))
+        # Вторая загрузка пересекается с первой по дням и категориям
+        add_transactions(self.user, self.transactions(self.user, 20, start=date(2024, 2, 1)))
+        self.assertEqual(check_rollups(self.user), [])
+        self.assertEqual(check_rollups(), [])
+
+        transaction = Transaction.objects.filter(author=self.user).first()
+        delete_transactions(self.user, Transaction.objects.filter(pk=transaction.pk))
+        self.assertFalse(Transaction.objects.filter(pk=transaction.pk).exists())
+        self.assertEqual(check_rollups(self.user), [])
+
+        # Чужие транзакции не удаляются и сводки другого пользователя не меняются
+        foreign = Transaction.objects.filter(author=self.other).first()
+        delete_transactions(self.user, Transaction.objects.filter(pk=foreign.pk))
+        self.assertTrue(Transaction.objects.filter(pk=foreign.pk).exists())
+        self.assertEqual(check_rollups(), [])
+
+        delete_all_transactions(self.user)
+        self.assertEqual(check_rollups(self.user), [])
+        self.assertFalse(DailySpending.objects.filter(author=self.user).exists())
+        self.assertFalse(MonthlySpending.objects.filter(author=self.user).exists())
+        self.assertEqual(Transaction.objects.filter(author=self.other).count(), 25)
+        self.assertEqual(check_rollups(self.other), [])
+        self.assertEqual(check_rollups(), [])
+
+    def test_views_keep_rollups_in_sync(self):
+        add_transactions(self.other, self.transactions(self.other, 5))
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('operations.csv', (
+            'Дата,Карта,Валюта,Категория,MCC,Описание,Бонусы,Сумма\n'
+            '01.02.2024 10:00:00,1234,RUB,Еда,5411,Магазин,0,"-1,234.50"\n'
+            '01.02.2024 12:00:00,1234,RUB,,5411,Возврат,0,100\n'
+            '03.03.2024 09:00:00,1234,RUB,Такси,4121,Такси,0,-300\n'
+        ).encode())
+        self.client.post(reverse('upload_transactions'), {'file': upload})
+        self.assertEqual(Transaction.objects.filter(author=self.user).count(), 3)
+        self.assertEqual(check_rollups(self.user), [])
+
+        transaction = Transaction.objects.filter(author=self.user, category='Еда').get()
+        self.client.post(reverse('delete_transaction', args=[transaction.pk]))
+        self.assertEqual(check_rollups(self.user), [])
+
+        self.client.post(reverse('delete_all_transactions'))
+        self.assertFalse(Transaction.objects.filter(author=self.user).exists())
+        self.assertEqual(Transaction.objects.filter(author=self.other).count(), 5)
+        self.assertEqual(check_rollups(), [])
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class CandleStoreTests(TestCase):
+    figi = 'BBG000000001'
+
+    def setUp(self):
+        self.calls = []
+        # Текущее время далеко после запрашиваемых периодов — все свечи закрыты
+        self.now = utc(2024, 1, 10)
+        patches = [
+            mock.patch.object(candles, 'fetch_candles', self.fake_fetch),
+            mock.patch.object(candles, 'tinkoff_client', lambda token: nullcontext()),
+            mock.patch.object(candles.timezone, 'now', lambda: self.now),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def fake_fetch(self, client, figi, interval, start_time, end_time):
+        # Свеча на каждую границу интервала; цена — номер минуты от начала суток
+        self.calls.append((interval, start_time, end_time))
+        times = pd.date_range(start_time, end_time, freq=f'{interval}min', inclusive='left')
+        minutes = (times.hour * 60 + times.minute).to_numpy(dtype=float)
+        return pd.DataFrame({
+            'time': times, 'open': minutes, 'high': minutes + 1, 'low': minutes - 1,
+            'close': minutes + 0.5, 'volume': 10,
+        }, columns=candles.CANDLE_COLUMNS)
+
+    def test_missing_ranges(self):
+        CandleRange.objects.create(figi=self.figi, interval=1, start=utc(2024, 1, 2, 10), end=utc(2024, 1, 2, 11))
+        CandleRange.objects.create(figi=self.figi, interval=1, start=utc(2024, 1, 2, 12), end=utc(2024, 1, 2, 13))
+        gaps = candles.get_missing_ranges(self.figi, 1, utc(2024, 1, 2, 9, 30), utc(2024, 1, 2, 13, 30))
+        self.assertEqual(gaps, [
+            (utc(2024, 1, 2, 9, 30), utc(2024, 1, 2, 10)),
+            (utc(2024, 1, 2, 11), utc(2024, 1, 2, 12)),
+            (utc(2024, 1, 2, 13), utc(2024, 1, 2, 13, 30)),
+        ])
+        self.assertEqual(candles.get_missing_ranges(self.figi, 1, utc(2024, 1, 2, 10), utc(2024, 1, 2, 11)), [])
+
+    def test_mark_range_loaded_merges_and_stops_at_last_closed_candle(self):
+        self.now = utc(2024, 1, 2, 12, 7)
+        candles.mark_range_loaded(self.figi, 5, utc(2024, 1, 2, 11), utc(2024, 1, 2, 13))
+        candles.mark_range_loaded(self.figi, 5, utc(2024, 1, 2, 10), utc(2024, 1, 2, 11))
+        self.assertEqual(
+            list(CandleRange.objects.filter(figi=self.figi, interval=5).values_list('start', 'end')),
+            [(utc(2024, 1, 2, 10), utc(2024, 1, 2, 12, 5))],
+        )
+        # Текущая свеча 12:05 еще не закрыта и будет запрошена снова
+        self.assertEqual(
+            candles.get_missing_ranges(self.figi, 5, utc(2024, 1, 2, 10), utc(2024, 1, 2, 12, 10)),
+            [(utc(2024, 1, 2, 12, 5), utc(2024, 1, 2, 12, 10))],
+        )
+
+    def test_resample_candles(self):
+        df = self.fake_fetch(None, self.figi, 1, utc(2024, 1, 2, 10), utc(2024, 1, 2, 10, 10))
+        result = candles.resample_candles(df, 5)
+        self.assertEqual(list(result['time']), [pd.Timestamp(utc(2024, 1, 2, 10)), pd.Timestamp(utc(2024, 1, 2, 10, 5))])
+        self.assertEqual(result['open'].tolist(), [600, 605])
+        self.assertEqual(result['high'].tolist(), [605, 610])
+        self.assertEqual(result['low'].tolist(), [599, 604])
+        self.assertEqual(result['close'].tolist(), [604.5, 609.5])
+        self.assertEqual(result['volume'].tolist(), [50, 50])
+
+    def test_repeated_range_is_served_from_database(self):
+        start, end = utc(2024, 1, 2, 10), utc(2024, 1, 2, 12)
+        first = candles.get_candles('t.test', self.figi, 1, start, end)
+        self.assertEqual(len(first), 120)
+        self.assertEqual(self.calls, [(1, start, end)])
+
+        self.calls.clear()
+        second = candles.get_candles('t.test', self.figi, 1, start, end)
+        self.assertEqual(self.calls, [])
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_extended_range_fetches_only_missing_parts(self):
+        candles.get_candles('t.test', self.figi, 1, utc(2024, 1, 2, 10), utc(2024, 1, 2, 12))
+        self.calls.clear()
+
+        df = candles.get_candles('t.test', self.figi, 1, utc(2024, 1, 2, 9), utc(2024, 1, 2, 13))
+        self.assertEqual(sorted(self.calls), [
+            (1, utc(2024, 1, 2, 9), utc(2024, 1, 2, 10)),
+            (1, utc(2024, 1, 2, 12), utc(2024, 1, 2, 13)),
+        ])
+        self.assertEqual(len(df), 240)
+        self.assertTrue(df['time'].is_monotonic_increasing)
+
+    def test_higher_interval_is_built_from_loaded_candles(self):
+        candles.get_candles('t.test', self.figi, 1, utc(2024, 1, 2, 10), utc(2024, 1, 2, 11))
+        self.calls.clear()
+
+        df = candles.get_candles('t.test', self.figi, 15, utc(2024, 1, 2, 10), utc(2024, 1, 2, 11))
+        self.assertEqual(self.calls, [])
+        self.assertEqual(df['open'].tolist(), [600, 615, 630, 645])
+        self.assertEqual(df['close'].tolist(), [614.5, 629.5, 644.5, 659.5])
+
+
+class FakeClock:
+    """
+    Время для лимитера: sleep() не ждет, а сдвигает часы.
+    """
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeRpcError(grpc.RpcError):
+    def __init__(self, code, reset=None):
+        self._code = code
+        self._reset = reset
+
+    def code(self):
+        return self._code
+
+    def trailing_metadata(self):
+        return [('x-ratelimit-reset', self._reset)] if self._reset is not None else []
+
+
+class RateLimitTests(SimpleTestCase):
+    limits = {'default': 60, 'MarketDataService': 120}
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patch = mock.patch.object(rate_limit, 'time', self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.limiter = rate_limit.TokenBucketLimiter(f'{directory.name}/buckets.sqlite3', self.limits)
+
+    def test_bucket_starts_full_then_waits(self):
+        for _ in range(60):
+            self.assertEqual(self.limiter.try_acquire('t.a', 'UsersService'), 0)
+        # 60 запросов в минуту — следующий токен через секунду
+        self.assertAlmostEqual(self.limiter.try_acquire('t.a', 'UsersService'), 1.0)
+
+    def test_bucket_refills_with_time(self):
+        for _ in range(60):
+            self.limiter.try_acquire('t.a', 'UsersService')
+        self.clock.now += 2
+        self.assertEqual(self.limiter.try_acquire('t.a', 'UsersService'), 0)
+        self.assertEqual(self.limiter.try_acquire('t.a', 'UsersService'), 0)
+        self.assertGreater(self.limiter.try_acquire('t.a', 'UsersService'), 0)
+
+    def test_buckets_are_per_token_and_service(self):
+        for _ in range(60):
+            self.limiter.try_acquire('t.a', 'UsersService')
+        self.assertEqual(self.limiter.try_acquire('t.b', 'UsersService'), 0)
+        for _ in range(120):
+            self.assertEqual(self.limiter.try_acquire('t.a', 'MarketDataService'), 0)
+
+    def test_acquire_sleeps_when_empty(self):
+        for _ in range(60):
+            self.limiter.acquire('t.a', 'UsersService')
+        self.assertEqual(self.clock.sleeps, [])
+        self.limiter.acquire('t.a', 'UsersService')
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertAlmostEqual(self.clock.sleeps[0], 1.0)
+
+    def scheduler(self, attempts=3):
+        return rate_limit.Scheduler(self.limiter, attempts=attempts, base_delay=0.1, max_delay=1)
+
+    def test_call_retries_resource_exhausted_after_reset(self):
+        outcomes = [
+            FakeRpcError(grpc.StatusCode.RESOURCE_EXHAUSTED, reset='5'),
+            FakeRpcError(grpc.StatusCode.RESOURCE_EXHAUSTED, reset='3'),
+            FakeRpcError(grpc.StatusCode.OK),
+        ]
+        result = self.scheduler().call('t.a', '/contract.v1.UsersService/GetAccounts', lambda: outcomes.pop(0))
+        self.assertEqual(result.code(), grpc.StatusCode.OK)
+        # Задержка не меньше времени до сброса лимита из x-ratelimit-reset
+        self.assertEqual(len(self.clock.sleeps), 2)
+        self.assertGreaterEqual(self.clock.sleeps[0], 5)
+        self.assertGreaterEqual(self.clock.sleeps[1], 3)
+
+    def test_call_gives_up_after_attempts(self):
+        calls = []
+
+        def invoke():
+            calls.append(1)
+            return FakeRpcError(grpc.StatusCode.RESOURCE_EXHAUSTED, reset='1')
+
+        result = self.scheduler(attempts=2).call('t.a', 'UsersService/GetAccounts', invoke)
+        self.assertEqual(result.code(), grpc.StatusCode.RESOURCE_EXHAUSTED)
+        self.assertEqual(len(calls), 2)
+
+    def test_call_does_not_retry_other_errors(self):
+        calls = []
+
+        def invoke():
+            calls.append(1)
+            return FakeRpcError(grpc.StatusCode.UNAVAILABLE)
+
+        result = self.scheduler().call('t.a', 'UsersService/GetAccounts', invoke)
+        self.assertEqual(result.code(), grpc.StatusCode.UNAVAILABLE)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_call_async_retries_resource_exhausted(self):
+        error = Exception('RESOURCE_EXHAUSTED')
+        error.code = grpc.StatusCode.RESOURCE_EXHAUSTED
+        error.metadata = mock.Mock(ratelimit_reset=4)
+        results = [error, 'accounts']
+        sleeps = []
+
+        async def make_call():
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        async def sleep(seconds):
+            sleeps.append(seconds)
+
+        with mock.patch.object(rate_limit.asyncio, 'sleep', sleep):
+            result = asyncio.run(self.scheduler().call_async('t.a', 'UsersService/GetAccounts', make_call))
+        self.assertEqual(result, 'accounts')
+        self.assertEqual(len(sleeps), 1)
+        self.assertGreaterEqual(sleeps[0], 4)
+
+
+class InstrumentSyncTests(TestCase):
+    def share(self, figi, name):
+        return SimpleNamespace(
+            figi=figi, ticker=figi[-4:], name=name, currency='rub', sector='it', country_of_risk='RU',
+            country_of_risk_name='Россия', exchange='MOEX', lot=1, nominal=None,
+            trading_status='normal', ipo_date=None,
+        )
+
+    def sync(self, *shares):
+        return sync_catalog({Instrument.SHARE: list(shares)})[Instrument.SHARE]
+
+    def test_activity_lives_in_registry(self):
+        first, second = self.share('BBG00000000A', 'Альфа'), self.share('BBG00000000B', 'Бета')
+        stats = self.sync(first, second)
+        self.assertEqual(stats['inserted'], 2)
+        self.assertEqual(Instrument.objects.filter(is_active=True).count(), 2)
+        self.assertEqual(Stock.objects.filter(instrument__isnull=True).count(), 0)
+
+        # Инструмент пропал из каталога — помечается неактивным только в реестре
+        stats = self.sync(first)
+        self.assertEqual((stats['unchanged'], stats['removed']), (1, 1))
+        removed = Instrument.objects.get(figi='BBG00000000B')
+        self.assertFalse(removed.is_active)
+        self.assertIsNotNone(removed.removed_at)
+        self.assertEqual(removed.detail.name, 'Бета')
+
+        # Повторная синхронизация без изменений ничего не трогает
+        stats = self.sync(first)
+        self.assertEqual((stats['updated'], stats['removed']), (0, 0))
+
+        # Вернулся в каталог — снова активен
+        stats = self.sync(first, second)
+        self.assertEqual(stats['updated'], 1)
+        returned = Instrument.objects.get(figi='BBG00000000B')
+        self.assertTrue(returned.is_active)
+        self.assertIsNone(returned.removed_at)
+
+
+class FakeReadyFuture:
+    def __init__(self, ready):
+        self.ready = ready
+        self.cancelled = False
+
+    def result(self, timeout=None):
+        if not self.ready:
+            raise grpc.FutureTimeoutError()
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class ChannelPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.channels = []
+        self.healthy = {}
+        patcher = mock.patch('core.tinkoff_pool.time.monotonic', self.clock.time)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('core.tinkoff_pool.grpc.channel_ready_future',
+                             lambda channel: FakeReadyFuture(self.healthy.get(channel, True)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = ChannelPool(channel_factory=self.channel_factory, idle_timeout=300,
+                                health_check_after=60, health_check_timeout=1)
+
+    def channel_factory(self):
+        channel = mock.Mock()
+        self.channels.append(channel)
+        return channel
+
+    def use(self):
+        entry = self.pool.acquire('token')
+        self.pool.release(entry)
+        return entry
+
+    def test_recent_channel_is_not_probed(self):
+        first = self.use()
+        self.healthy[first.channel] = False
+        self.clock.sleep(30)
+        self.assertIs(self.use(), first)
+        self.assertEqual(self.pool.created, 1)
+
+    def test_failed_check_replaces_idle_channel(self):
+        first = self.use()
+        self.healthy[first.channel] = False
+        self.clock.sleep(90)
+        second = self.use()
+        self.assertIsNot(second, first)
+        self.assertEqual(self.pool.created, 2)
+        first.channel.close.assert_called_once()
+
+    def test_healthy_idle_channel_is_kept(self):
+        first = self.use()
+        self.clock.sleep(90)
+        self.assertIs(self.use(), first)
+        self.assertEqual(self.pool.created, 1)
+
+
+class DownsamplingTests(SimpleTestCase):
+    def test_lttb_keeps_ends(self):
+        x = np.arange(1000)
+        y = np.sin(x / 20)
+        indices = lttb(x, y, 100)
+        self.assertEqual(len(indices), 100)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertTrue((np.diff(indices) > 0).all())
+
+    def test_downsample_line_length(self):
+        x = np.arange(5000, dtype=float)
+        y = np.random.default_rng(0).normal(size=5000).cumsum()
+        small_x, small_y = downsample_line(x, y, max_points=300)
+        self.assertEqual(len(small_x), 300)
+        self.assertEqual((small_x[0], small_x[-1]), (0.0, 4999.0))
+        self.assertEqual(small_y[-1], y[-1])
+
+    def test_downsample_line_dates(self):
+        x = pd.date_range('2024-01-01', periods=1000, freq='h')
+        y = np.arange(1000, dtype=float)
+        with mock.patch('core.downsampling.lttb', wraps=lttb) as wrapped:
+            small_x, small_y = downsample_line(x, y, max_points=50)
+        numeric = wrapped.call_args.args[0]
+        self.assertEqual(numeric.dtype, np.int64)
+        self.assertEqual(numeric[1] - numeric[0], 3600 * 10 ** 9)
+        self.assertEqual(small_x.dtype.kind, 'M')
+        self.assertEqual((small_x[0], small_x[-1]), (x.to_numpy()[0], x.to_numpy()[-1]))
+        self.assertEqual(len(small_y), 50)
+
+    def test_downsample_ohlc_buckets(self):
+        rng = np.random.default_rng(1)
+        close = 100 + rng.normal(size=1000).cumsum()
+        df = pd.DataFrame({
+            'time': pd.date_range('2024-01-01', periods=1000, freq='min', tz='UTC'),
+            'open': close + rng.normal(size=1000),
+            'high': close + 5 + rng.random(1000),
+            'low': close - 5 - rng.random(1000),
+            'close': close,
+            'volume': rng.integers(1, 100, size=1000),
+        })
+        result = downsample_ohlc(df, max_points=100)
+        self.assertEqual(len(result), 100)
+
+        # 1000 свечей на 100 групп — ровно по 10 подряд
+        groups = df.groupby(np.arange(1000) // 10)
+        expected = groups.agg(time=('time', 'first'), open=('open', 'first'), high=('high', 'max'),
+                              low=('low', 'min'), close=('close', 'last'), volume=('volume', 'sum'))
+        self.assertEqual(result['time'].tolist(), expected['time'].tolist())
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            self.assertEqual(result[column].tolist(), expected[column].tolist(), column)
+
+    def test_disabled_is_noop(self):
+        df = pd.DataFrame({'time': range(10), 'open': range(10), 'high': range(10),
+                           'low': range(10), 'close': range(10)})
+        x, y = np.arange(10), np.arange(10)
+        with self.settings(CHART_DOWNSAMPLING=False):
+            self.assertIs(downsample_ohlc(df, max_points=3), df)
+            small_x, small_y = downsample_line(x, y, max_points=3)
+        self.assertIs(small_x, x)
+        self.assertIs(small_y, y)
+
+
+class InstrumentSearchTests(TestCase):
+    def setUp(self):
+        for figi, ticker, name, is_active in [
+            ('BBG004730N88', 'SBER', 'Сбербанк России', True),
+            ('BBG004731032', 'LKOH', 'Лукойл', True),
+            ('BBG000000001', 'OLDB', 'Старый Банк', False),
+        ]:
+            Instrument.objects.create(figi=figi, ticker=ticker, name=name, type=Instrument.SHARE,
+                                      currency='rub', is_active=is_active)
+        InstrumentSyncRun.objects.create()
+        self.index = InstrumentSearchIndex(check_interval=0)
+
+    def tickers(self, query):
+        return [row['ticker'] for row in self.index.search(query)]
+
+    def test_trigram_in_middle_of_name(self):
+        self.assertEqual(self.tickers('бан'), ['SBER'])
+        self.assertEqual(self.tickers('ойл'), ['LKOH'])
+
+    def test_short_query_uses_word_prefixes(self):
+        self.assertEqual(self.tickers('ро'), ['SBER'])    # "России"
+        self.assertEqual(self.tickers('рб'), [])          # только середина "Сбербанк"
+        self.assertEqual(self.tickers('lk'), ['LKOH'])
+
+    def test_inactive_excluded(self):
+        self.assertEqual(self.tickers('старый'), [])
+        self.assertEqual(self.tickers('oldb'), [])
+
+    def test_rebuilt_after_sync_run(self):
+        self.assertEqual(self.tickers('газпром'), [])
+        Instrument.objects.create(figi='BBG004730RP0', ticker='GAZP', name='Газпром', type=Instrument.SHARE,
+                                  currency='rub')
+        # Без новой синхронизации индекс не перестраивается
+        self.assertEqual(self.tickers('газпром'), [])
+        InstrumentSyncRun.objects.create()
+        self.assertEqual(self.tickers('газпром'), ['GAZP'])
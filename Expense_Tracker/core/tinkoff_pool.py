@@ -0,0 +1,201 @@
+import atexit
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import grpc
+from django.conf import settings
+
+from tinkoff.invest import AsyncClient
+from tinkoff.invest.async_services import AsyncServices
+from tinkoff.invest.channels import create_channel
+from tinkoff.invest.services import Services
+
+from .rate_limit import RateLimitInterceptor, scheduler
+
+
+def create_api_channel():
+    """
+    Канал к Tinkoff Invest API или, если задан TINKOFF_FAKE_SERVER, к локальному fake-серверу.
+    """
+    if settings.TINKOFF_FAKE_SERVER:
+        return grpc.insecure_channel(settings.TINKOFF_FAKE_SERVER)
+    return create_channel()
+
+
+def default_channel_factory():
+    """
+    Канал к Tinkoff Invest API, все вызовы которого идут через лимитер запросов.
+    """
+    return grpc.intercept_channel(create_api_channel(), RateLimitInterceptor(scheduler))
+
+
+def is_connection_error(error):
+    """
+    Проверяет, что ошибка вызвана недоступностью сервера (канал нужно пересоздать).
+    """
+    code = getattr(error, 'code', None)
+    if callable(code):
+        code = code()
+    return code == grpc.StatusCode.UNAVAILABLE
+
+
+class PooledChannel:
+    """
+    Открытый gRPC-канал вместе с сервисами Tinkoff Invest API для одного токена.
+    """
+    def __init__(self, channel, token):
+        self.token = token
+        self.channel = channel
+        self.services = Services(channel, token=token)
+        self.last_used = time.monotonic()
+        self.in_use = 0
+        self.broken = False
+
+    def close(self):
+        self.channel.close()
+
+
+class ChannelPool:
+    """
+    Пул gRPC-каналов Tinkoff Invest API на процесс: один теплый канал на токен.
+
+    Канал переиспользуется между запросами, закрывается после idle_timeout секунд
+    простоя и пересоздается, если сервер стал недоступен (UNAVAILABLE) или канал
+    не прошел проверку: канал, простоявший дольше health_check_after секунд,
+    проверяется перед выдачей.
+    """
+    def __init__(self, channel_factory=None, idle_timeout=None, health_check_after=None, health_check_timeout=None):
+        self._channel_factory = channel_factory or default_channel_factory
+        self._idle_timeout = idle_timeout if idle_timeout is not None else settings.TINKOFF_CHANNEL_IDLE_TIMEOUT
+        self._health_check_after = (health_check_after if health_check_after is not None
+                                    else settings.TINKOFF_CHANNEL_HEALTH_CHECK_AFTER)
+        self._health_check_timeout = (health_check_timeout if health_check_timeout is not None
+                                      else settings.TINKOFF_CHANNEL_HEALTH_CHECK_TIMEOUT)
+        self._channels = {}
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def acquire(self, token):
+        """
+        Выдает канал для токена, при необходимости открывая новый.
+        После использования канал нужно вернуть через release().
+        """
+        with self._lock:
+            self._evict_idle()
+            entry = self._channels.get(token)
+            stale = (entry is not None and not entry.broken and entry.in_use == 0
+                     and time.monotonic() - entry.last_used >= self._health_check_after)
+
+        # Проверка может ждать до health_check_timeout секунд, поэтому идет без блокировки пула
+        if stale and not self._is_healthy(entry, self._health_check_timeout):
+            entry.broken = True
+
+        with self._lock:
+            entry = self._channels.get(token)
+            if entry is not None and entry.broken:
+                # Сломанный канал больше не выдаем; закроется, когда его отпустят
+                self._channels.pop(token)
+                if entry.in_use == 0:
+                    entry.close()
+                entry = None
+            if entry is None:
+                entry = PooledChannel(self._channel_factory(), token)
+                self._channels[token] = entry
+                self.created += 1
+            entry.in_use += 1
+            entry.last_used = time.monotonic()
+            return entry
+
+    def release(self, entry, broken=False):
+        with self._lock:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            entry.broken = entry.broken or broken
+            # Канал, уже убранный из пула, закрываем после последнего использования
+            if entry.in_use == 0 and self._channels.get(entry.token) is not entry:
+                entry.close()
+
+    @contextmanager
+    def client(self, token):
+        """
+        Аналог `with Client(token) as client`, но без открытия нового соединения.
+        """
+        entry = self.acquire(token)
+        broken = False
+        try:
+            yield entry.services
+        except Exception as e:
+            broken = is_connection_error(e)
+            raise
+        finally:
+            self.release(entry, broken)
+
+    def check_health(self, timeout=None):
+        """
+        Активно проверяет все каналы: те, что не подключаются за timeout секунд,
+        помечаются сломанными и будут пересозданы при следующем запросе.
+        Возвращает число сломанных каналов.
+        """
+        with self._lock:
+            entries = list(self._channels.values())
+
+        broken = 0
+        for entry in entries:
+            if not self._is_healthy(entry, timeout if timeout is not None else self._health_check_timeout):
+                entry.broken = True
+                broken += 1
+        return broken
+
+    @staticmethod
+    def _is_healthy(entry, timeout):
+        ready = grpc.channel_ready_future(entry.channel)
+        try:
+            ready.result(timeout=timeout)
+        except grpc.FutureTimeoutError:
+            ready.cancel()
+            return False
+        return True
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for token, entry in list(self._channels.items()):
+            if entry.in_use == 0 and now - entry.last_used > self._idle_timeout:
+                self._channels.pop(token).close()
+
+    def close_all(self):
+        """
+        Закрывает все каналы (вызывается при завершении процесса).
+        """
+        with self._lock:
+            for entry in self._channels.values():
+                entry.close()
+            self._channels.clear()
+
+    def __len__(self):
+        return len(self._channels)
+
+
+pool = ChannelPool()
+atexit.register(pool.close_all)
+
+
+def tinkoff_client(token):
+    """
+    Возвращает контекстный менеджер с сервисами Tinkoff Invest API из общего пула.
+    """
+    return pool.client(token)
+
+
+@asynccontextmanager
+async def async_tinkoff_client(token):
+    """
+    Аналог `async with AsyncClient(token)`, учитывающий TINKOFF_FAKE_SERVER.
+    """
+    if not settings.TINKOFF_FAKE_SERVER:
+        async with AsyncClient(token) as client:
+            yield client
+        return
+
+    async with grpc.aio.insecure_channel(settings.TINKOFF_FAKE_SERVER) as channel:
+        yield AsyncServices(channel, token=token)
@@ -0,0 +1,66 @@
+import hashlib
+
+import grpc
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from tinkoff.invest import RequestError
+
+from .models import TokenVersion
+from .tinkoff_pool import tinkoff_client
+
+# Коды ответа, однозначно означающие, что токен не работает
+INVALID_TOKEN_CODES = (grpc.StatusCode.UNAUTHENTICATED, grpc.StatusCode.PERMISSION_DENIED)
+
+
+def _token_hash(token):
+    # Сам токен ни в кэш, ни в БД не кладем
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _cache_key(token):
+    token_hash = _token_hash(token)
+    version = TokenVersion.objects.filter(token_hash=token_hash).values_list('version', flat=True).first() or 1
+    return f'tinkoff_token_valid:{token_hash}:{version}'
+
+
+def is_token_valid(token):
+    """
+    Проверяет токен Tinkoff Invest API самым дешевым запросом (GetInfo).
+    Результат кэшируется на TINKOFF_TOKEN_CACHE_TTL секунд; временные ошибки
+    сети не кэшируются. Версия токена в ключе хранится в БД, поэтому invalidate_token
+    действует на все процессы, а не только на тот, где токен сохранили.
+    """
+    if token is None or not isinstance(token, str):
+        return False
+
+    key = _cache_key(token)
+    valid = cache.get(key)
+    if valid is not None:
+        return valid
+
+    try:
+        with tinkoff_client(token) as client:
+            client.users.get_info()
+        valid = True
+    except RequestError as e:
+        if e.code not in INVALID_TOKEN_CODES:
+            print(str(e))
+            return False
+        valid = False
+
+    cache.set(key, valid, settings.TINKOFF_TOKEN_CACHE_TTL)
+    return valid
+
+
+def invalidate_token(token):
+    """
+    Сбрасывает закэшированный результат проверки токена во всех процессах:
+    увеличивает версию токена в БД.
+    """
+    if not token:
+        return
+    token_hash = _token_hash(token)
+    if not TokenVersion.objects.filter(token_hash=token_hash).update(version=F('version') + 1):
+        TokenVersion.objects.get_or_create(token_hash=token_hash, defaults={'version': 2})
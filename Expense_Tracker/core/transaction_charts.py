@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
+
+from .functions import barchart_figure, get_system_token, linegraph_figure, piechart_figure
+from .fx import convert, get_rates
+from .models import DailySpending, MonthlySpending, Transaction
+
+
+def filter_transactions(queryset, params):
+    """
+    Применяет фильтры страницы транзакций (start_date, end_date, category) из GET-параметров.
+    """
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    category = params.get('category')
+
+    if start_date:
+        queryset = queryset.filter(operation_date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(operation_date__lte=end_date)
+    if category:
+        queryset = queryset.filter(category=category)
+
+    return queryset.order_by('-operation_date')  # Сортировка по убыванию даты
+
+
+def rollup_queryset(user, params, monthly=False):
+    """
+    Строки сводки расходов пользователя с фильтрами страницы транзакций.
+    Помесячная сводка берется, только если не заданы даты (они могут резать месяц).
+    """
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    category = params.get('category')
+
+    model = MonthlySpending if monthly and not (start_date or end_date) else DailySpending
+    queryset = model.objects.filter(author=user)
+    if start_date:
+        queryset = queryset.filter(period__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(period__lte=end_date)
+    if category:
+        queryset = queryset.filter(category=category)
+    return queryset
+
+
+def transaction_categories(user):
+    """
+    Категории транзакций пользователя по алфавиту. Берутся из самой таблицы транзакций,
+    как и число строк для пагинации: записи мимо сводок их не сбивают.
+    """
+    return list(
+        Transaction.objects.filter(author=user)
+        .order_by('category')
+        .values_list('category', flat=True)
+        .distinct()
+    )
+
+
+def spending(queryset, group, user):
+    """
+    Суммы и количества из сводки расходов, сгруппированные в SQL по group и валюте;
+    в Python приходят только агрегаты, которые переводятся в рубли и сворачиваются по group.
+
+    :param queryset: Строки сводки (rollup_queryset).
+    :param group: Выражение группировки: F('period'), TruncMonth('period') или F('category').
+    :param user: Пользователь (его токен нужен для курсов валют).
+    :return: DataFrame с индексом group и столбцами spent (расходы в рублях, положительные),
+        expenses (число расходных операций), count (число всех операций).
+    """
+    rows = list(
+        queryset.order_by()
+        .annotate(key=group)
+        .values('key', 'currency')
+        .annotate(total_spent=Sum('spent'), total_expenses=Sum('expenses'), total_count=Sum('count'))
+        .values_list('key', 'currency', 'total_spent', 'total_expenses', 'total_count')
+    )
+    df = pd.DataFrame(rows, columns=['key', 'currency', 'spent', 'expenses', 'count'])
+    df['spent'] = df['spent'].fillna(0).astype(float)
+
+    # Операции в валюте переводим в рубли по текущему курсу
+    if (df['currency'].str.lower() != 'rub').any():
+        rates = get_rates(get_system_token(user))
+        df['spent'] = convert(df['spent'], df['currency'], rates)
+        # Суммы в валюте без курса в графики не попадают, остальные строятся как обычно
+        no_rate = df['spent'].isna()
+        if no_rate.any():
+            print(f"Нет курса к рублю для валют: {', '.join(sorted(df.loc[no_rate, 'currency'].unique()))}")
+            df = df[~no_rate]
+    df['spent'] = -df['spent']
+    return df.groupby('key')[['spent', 'expenses', 'count']].sum()
+
+
+def fill_days(spent):
+    """
+    Расходы по каждому дню от первой до последней операции, дни без операций — нули.
+    """
+    days = pd.DatetimeIndex(spent.index)
+    index = pd.date_range(days.min(), days.max())
+    offsets = (days - days.min()).days
+    return pd.Series(np.bincount(offsets, weights=spent.to_numpy(), minlength=len(index)), index=index)
+
+
+def fill_months(spent):
+    """
+    Расходы по каждому месяцу от первой до последней операции, месяцы без операций — нули.
+    Подписи — последние дни месяцев.
+    """
+    months = pd.DatetimeIndex(spent.index)
+    numbers = months.year * 12 + months.month
+    index = pd.date_range(months.min(), months.max(), freq='MS') + pd.offsets.MonthEnd(0)
+    offsets = numbers - numbers.min()
+    return pd.Series(np.bincount(offsets, weights=spent.to_numpy(), minlength=len(index)), index=index)
+
+
+def daily_figure(params, user):
+    by_day = spending(rollup_queryset(user, params), F('period'), user)
+    if by_day.empty:
+        return None
+    by_day = fill_days(by_day['spent'])
+    return linegraph_figure(by_day.index, by_day.to_numpy())
+
+
+def monthly_figure(params, user):
+    by_month = spending(rollup_queryset(user, params, monthly=True), TruncMonth('period'), user)
+    if by_month.empty:
+        return None
+    by_month = fill_months(by_month['spent'])
+    return linegraph_figure(by_month.index, by_month.to_numpy())
+
+
+def category_pie_figure(params, user):
+    by_category = spending(rollup_queryset(user, params, monthly=True), F('category'), user)
+    if by_category.empty:
+        return None
+    by_category = by_category[by_category['expenses'] > 0]
+    return piechart_figure(by_category['spent'].to_numpy(), by_category.index)
+
+
+def category_bar_figure(params, user):
+    by_category = spending(rollup_queryset(user, params, monthly=True), F('category'), user)
+    if by_category.empty:
+        return None
+    by_category = by_category.sort_values(by='count', ascending=False)
+    return barchart_figure(by_category.index, by_category['count'])
+
+
+# Вид графика страницы транзакций -> функция построения по фильтрам страницы
+TRANSACTION_CHARTS = {
+    'daily': daily_figure,
+    'monthly': monthly_figure,
+    'pie': category_pie_figure,
+    'bar': category_bar_figure,
+}
+
+
+def transaction_figure(kind, params, user):
+    """
+    Строит график страницы транзакций по сводкам расходов; None, если транзакций нет.
+
+    :param params: Фильтры страницы (start_date, end_date, category).
+    """
+    return TRANSACTION_CHARTS[kind](params, user)
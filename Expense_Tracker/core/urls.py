@@ -4,8 +4,12 @@ from .views import *
 urlpatterns = [
     path('', startPage, name='home'),
     path('stocks/', StocksView.as_view(), name='stocks_graphs'),
+    path('stocks/search/', instrument_search, name='instrument_search'),
+    path('stocks/chart/', candlestick_chart, name='candlestick_chart'),
     path('stocks_bag/', portfolio_view, name='stocks_bag'),
+    path('stocks_bag/chart/', portfolio_chart, name='portfolio_chart'),
     path('transactions/', TransactionListView.as_view(), name='transaction_list'),
+    path('transactions/charts/<str:kind>/', transaction_chart, name='transaction_chart'),
     path('transactions/upload/', TransactionUploadView.as_view(), name='upload_transactions'),
     path('transactions/delete-all/', TransactionDeleteAllView.as_view(), name='delete_all_transactions'),
     path('transactions/delete/<int:pk>/', TransactionDeleteView.as_view(), name='delete_transaction'),
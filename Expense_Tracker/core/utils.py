@@ -0,0 +1,5 @@
+def cast_money(v):
+    """
+    Конвертирует значение MoneyValue в float.
+    """
+    return v.units + v.nano / 1e9
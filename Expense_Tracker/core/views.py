@@ -5,13 +5,16 @@ from django_plotly_dash.access import login_required
 
 from django.urls import reverse_lazy
 from django.views.generic.edit import FormView
-from .models import Stock, Bond
-from .forms import InstrumentSelectionForm
-from .functions import get_stock_data, get_stock_candlestick
+from .models import Stock, Bond, Instrument
+from .forms import CandlestickChartForm, InstrumentSelectionForm
+from .functions import get_stock_data
 from datetime import datetime, timedelta
 
 from .functions import *
 from django.shortcuts import render, redirect
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from urllib.parse import urlencode
 from .models import StockInfo
 from .forms import StockSelectionForm
 from datetime import datetime, timedelta
@@ -23,7 +26,12 @@ from io import TextIOWrapper
 import pandas as pd
 from .models import Transaction
 from .forms import TransactionFilterForm, TransactionUploadForm
-from .functions import get_linegraph, get_piechart, get_barchart
+from . import figures
+from .figi_index import figi_index
+from .instrument_search import search_index
+from .chart_cache import bump_transactions_version, chart_cache
+from .rollups import add_transactions, delete_all_transactions, delete_transactions
+from .transaction_charts import TRANSACTION_CHARTS, filter_transactions, transaction_categories, transaction_figure
 
 from users.models import *
 
@@ -41,8 +49,6 @@ class StocksView(LoginRequiredMixin, FormView):
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['stocks'] = Stock.objects.all()
-        kwargs['bonds'] = Bond.objects.all()
         kwargs['user'] = self.request.user  # Передаем текущего пользователя
         return kwargs
 
@@ -54,81 +60,90 @@ class StocksView(LoginRequiredMixin, FormView):
         duration = form.cleaned_data.get('duration')
         granularity = int(form.cleaned_data.get('granularity'))
 
-        # Определяем выбранный инструмент
-        if stock_figi:
-            instrument = Stock.objects.get(figi=stock_figi)
-            figi = stock_figi
-            instrument_type = "Stock"
-        elif bond_figi:
-            instrument = Bond.objects.get(figi=bond_figi)
-            figi = bond_figi
-            instrument_type = "Bond"
+        # Определяем выбранный инструмент одним запросом к реестру вместе с полями его типа
+        figi = stock_figi or bond_figi
+        instrument = Instrument.objects.select_related('stock_detail', 'bond_detail').get(figi=figi)
+        detail = instrument.detail
+        instrument_type = "Stock" if instrument.type == Instrument.SHARE else "Bond"
+
+        # График загружается отдельным запросом, когда попадает на экран
+        chart_url = reverse('candlestick_chart') + '?' + urlencode({
+            'figi': figi,
+            'end_date': end_date.isoformat(),
+            'duration': duration,
+            'granularity': granularity,
+        })
+
+        # Передаем данные в контекст
+        context = {
+            'symbol': instrument.ticker,
+            'end_day': end_date,
+            'field_name': f'{instrument.name} ({figi})',
+            'chart_url': chart_url,
+            'instrument_name': instrument.name,
+            'instrument_type': instrument_type,
+            'currency': instrument.currency,
+            'sector': getattr(detail, 'sector', 'N/A'),
+            'exchange': detail.exchange,
+            'nominal': detail.nominal,
+            'form': form,
+            'title': 'Котировки',
+        }
+
+        return render(self.request, self.template_name, context)
+
+
+def figure_response(fig, error="Нет данных для графика."):
+    """
+    JSON-описание графика plotly ({data, layout}) для отрисовки в браузере.
+    """
+    if fig is None:
+        return JsonResponse({'error': error}, status=404)
+    return HttpResponse(figures.to_json(fig), content_type='application/json')
 
-        try:
-            # Вычисляем start_time
-            end_time = datetime.combine(end_date, datetime.min.time())
-            start_time = get_start_time(end_time, duration)
-
-            # Получаем данные о графике
-            token = get_system_token(self.request.user)  # Получаем токен текущего пользователя
-            stock_data = get_stock_data(token=token, figi=instrument.figi, interval=granularity, start_time=start_time, end_time=end_time)
-
-            # Если данные отсутствуют, выводим сообщение об ошибке
-            if stock_data is None:
-                form.add_error(None, "Не удалось получить данные о котировках. Проверьте системный токен в вашем профиле.")
-                return self.form_invalid(form)
-
-            # Создаем график свечей
-            fig_div = get_stock_candlestick(stock_data)
-
-            # Передаем данные в контекст
-            context = {
-                'symbol': instrument.ticker,
-                'end_day': end_date,
-                'field_name': f'{instrument.name} ({figi})',
-                'stock_candlestick': fig_div,
-                'instrument_name': instrument.name,
-                'instrument_type': instrument_type,
-                'currency': instrument.currency,
-                'sector': getattr(instrument, 'sector', 'N/A'),
-                'exchange': instrument.exchange,
-                'nominal': instrument.nominal,
-                'form': form,
-                'title': 'Котировки',
-            }
-
-            return render(self.request, self.template_name, context)
-
-        except ValueError as e:
-            # Если данных нет, передаем сообщение об ошибке
-            form.add_error(None, str(e))
-            return self.form_invalid(form)
+
+@login_required
+def candlestick_chart(request):
+    """
+    График свечей инструмента: /stocks/chart/?figi=...&end_date=...&duration=...&granularity=...
+    """
+    form = CandlestickChartForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'error': ' '.join(e for errors in form.errors.values() for e in errors)}, status=400)
+
+    end_time = datetime.combine(form.cleaned_data['end_date'], datetime.min.time())
+    start_time = get_start_time(end_time, form.cleaned_data['duration'])
+    token = get_system_token(request.user)  # Получаем токен текущего пользователя
+    try:
+        stock_data = get_stock_data(
+            token=token, figi=form.cleaned_data['figi'], interval=int(form.cleaned_data['granularity']),
+            start_time=start_time, end_time=end_time
+        )
+    except ValueError as e:
+        # Если данных нет, передаем сообщение об ошибке
+        return JsonResponse({'error': str(e)}, status=404)
+
+    if stock_data is None:
+        return JsonResponse(
+            {'error': "Не удалось получить данные о котировках. Проверьте системный токен в вашем профиле."},
+            status=400
+        )
+    return figure_response(candlestick_figure(stock_data))
 
 
 # Transaction page
 class TransactionListView(LoginRequiredMixin, ListView):
     model = Transaction
-    template_name = 'core/combined.html'  # Новый объединенный шаблон
+    template_name = 'core/transaction_list.html'
     paginate_by = 10
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        queryset = queryset.filter(author=self.request.user)
+    # Столбцы таблицы транзакций: страница читается через values() без создания моделей
+    columns = ('id', 'operation_date', 'card_number', 'currency', 'category', 'mcc', 'description', 'bonuses', 'amount')
 
+    def get_queryset(self):
+        queryset = super().get_queryset().filter(author=self.request.user)
         # Фильтрация по параметрам GET-запроса
-        start_date = self.request.GET.get('start_date')
-        end_date = self.request.GET.get('end_date')
-        category = self.request.GET.get('category')
-
-        if start_date:
-            queryset = queryset.filter(operation_date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(operation_date__lte=end_date)
-        if category:
-            queryset = queryset.filter(category=category)
-
-        queryset = queryset.order_by('-operation_date')  # Сортировка по убыванию даты
-        return queryset
+        return filter_transactions(queryset, self.request.GET).values(*self.columns)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -137,73 +152,37 @@ class TransactionListView(LoginRequiredMixin, ListView):
         context['filter_form'] = TransactionFilterForm(self.request.GET)
         context['upload_form'] = TransactionUploadForm()
 
-        # Уникальные категории для текущего пользователя
-        context['categories'] = (
-            Transaction.objects
-            .filter(author=self.request.user)
-            .values_list('category', flat=True)
-            .distinct()
-        )
+        # Уникальные категории для текущего пользователя (из сводки расходов, а не по всем транзакциям)
+        context['categories'] = transaction_categories(self.request.user)
 
-        # Если данные есть, генерируем графики
-        if self.get_queryset().exists():
-            # Импортируем данные
-            expenses = self.get_queryset()
-
-            # Преобразуем данные в DataFrame
-            data = {
-                'Дата': [expense.operation_date for expense in expenses],
-                'Сумма': [expense.amount for expense in expenses],
-                'Категория': [expense.category for expense in expenses],
-            }
-            df = pd.DataFrame(data)
-            df['Дата'] = pd.to_datetime(pd.to_datetime(df['Дата']).dt.strftime("%Y-%m-%d"))
-
-            # Применяем фильтры из GET-параметров
-            start_date = self.request.GET.get('start_date')
-            end_date = self.request.GET.get('end_date')
-            category = self.request.GET.get('category')
-
-            if start_date:
-                df = df[df['Дата'] >= pd.to_datetime(start_date)]
-            if end_date:
-                df = df[df['Дата'] <= pd.to_datetime(end_date)]
-            if category:
-                df = df[df['Категория'] == category]
-
-            # Группировка по дням
-            df_by_day = df[df['Сумма'] < 0].groupby('Дата')[['Сумма']].sum().apply(lambda x: x * -1)
-
-            # Создание полного диапазона дат
-            all_dates = pd.date_range(start=df['Дата'].min(), end=df['Дата'].max())
-            full_date_df = pd.DataFrame(index=all_dates, columns=['Сумма']).fillna(0)
-            result_df = full_date_df.add(df_by_day, fill_value=0).reset_index().rename(columns={'index': 'Дата'})
-
-            # Группировка по месяцам
-            df_by_day = result_df.set_index('Дата')['Сумма']
-            df_by_month = result_df.set_index('Дата')['Сумма'].resample('1ME').sum()
-
-            # Графики по дням и месяцам
-            daily_fig1_div = get_linegraph(df_by_day.index, df_by_day.values)
-            monthly_fig1_div = get_linegraph(df_by_month.index, df_by_month.values)
-
-            # Остальные графики
-            df_by_category = df.groupby('Категория')[['Дата', 'Сумма']].count().sort_values(by='Сумма', ascending=False)
-            df_by_category_sum = df[df['Сумма'] < 0].groupby('Категория')[['Сумма']].sum().apply(abs)
-
-            fig2_div = get_piechart(df_by_category_sum['Сумма'].values, df_by_category_sum.index)
-            fig3_div = get_barchart(df_by_category.index, df_by_category['Сумма'])
-
-            # Передаем данные в контекст
-            context['daily_fig1'] = daily_fig1_div
-            context['monthly_fig1'] = monthly_fig1_div
-            context['fig2'] = fig2_div
-            context['fig3'] = fig3_div
-            context['title'] = 'Мои расходы'
+        # Графики строятся не здесь: страница загружает их из transaction_chart,
+        # когда они попадают на экран. Передаем только текущие фильтры
+        filters = {key: self.request.GET[key] for key in ('start_date', 'end_date', 'category') if self.request.GET.get(key)}
+        context['chart_query'] = urlencode(filters)
+        context['title'] = 'Мои расходы'
 
         return context
 
 
+@login_required
+def transaction_chart(request, kind):
+    """
+    График страницы транзакций (daily, monthly, pie, bar) с фильтрами страницы в GET-параметрах.
+    """
+    if kind not in TRANSACTION_CHARTS:
+        raise Http404
+
+    def build():
+        fig = transaction_figure(kind, request.GET, request.user)
+        return figures.to_json(fig) if fig is not None else None
+
+    # Листание таблицы и повторные заходы с теми же фильтрами берут график из кэша
+    body = chart_cache.get_or_build(request.user, kind, request.GET, build)
+    if body is None:
+        return figure_response(None)
+    return HttpResponse(body, content_type='application/json')
+
+
 class TransactionUploadView(LoginRequiredMixin, FormView):
     template_name = 'core/transaction_list.html'
     form_class = TransactionUploadForm
@@ -256,7 +235,9 @@ class TransactionUploadView(LoginRequiredMixin, FormView):
                 )
                 transactions.append(transaction)
 
-            Transaction.objects.bulk_create(transactions)
+            # Транзакции и сводки расходов сохраняются в одной транзакции БД
+            add_transactions(self.request.user, transactions)
+            bump_transactions_version(self.request.user)
         except Exception as e:
             form.add_error(None, f'Ошибка при обработке файла: {str(e)}')
             return self.form_invalid(form)
@@ -268,16 +249,18 @@ class TransactionDeleteAllView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('transaction_list')
 
     def post(self, request, *args, **kwargs):
-        Transaction.objects.all().delete()
+        delete_all_transactions(request.user)
+        bump_transactions_version(request.user)
         return redirect(self.success_url)
 
 
-class TransactionDeleteView(DeleteView):
+class TransactionDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('transaction_list')
 
     def post(self, request, *args, **kwargs):
         transaction_id = kwargs.get('pk')
-        Transaction.objects.filter(id=transaction_id).delete()
+        delete_transactions(request.user, Transaction.objects.filter(id=transaction_id))
+        bump_transactions_version(request.user)
         return redirect(self.success_url)
 
 
@@ -287,6 +270,36 @@ from django.shortcuts import render
 import plotly.express as px
 from .functions import get_invest_info
 
+@login_required
+def instrument_search(request):
+    """
+    Поиск инструментов для автодополнения: /stocks/search/?q=сбер&type=share,bond
+    """
+    types = [t for t in request.GET.get('type', '').split(',') if t]
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 50)
+    except ValueError:
+        limit = 20
+    results = search_index.search(request.GET.get('q', ''), types=types, limit=limit)
+    return JsonResponse({'results': results})
+
+
+@login_required
+def portfolio_chart(request):
+    """
+    График прибыли/убытков по позициям счета: /stocks_bag/chart/?account=...
+    """
+    try:
+        account = Account.objects.get(id=request.GET.get('account'), author=request.user)
+    except (Account.DoesNotExist, ValueError):
+        raise Http404
+    portfolio_data = get_invest_info(account.token, account.account_number)
+    if portfolio_data is None or portfolio_data.empty:
+        return figure_response(None)
+    portfolio_data['name'] = figi_index.lookup(portfolio_data['figi'])['name'].to_numpy()
+    return figure_response(portfolio_bars_figure(portfolio_data))
+
+
 @login_required
 def portfolio_view(request):
     # Инициализация переменных
@@ -294,7 +307,7 @@ def portfolio_view(request):
     account_id = None
     error = None
     table_data = None
-    chart_html = None
+    chart_url = None
 
     # Получаем выбранный аккаунт из GET-параметров
     selected_account_id = request.GET.get('account')
@@ -313,9 +326,9 @@ def portfolio_view(request):
             # Получаем данные о портфеле
             portfolio_data = get_invest_info(token, account_id)
 
-            # Добавляем столбец 'name' в DataFrame
+            # Добавляем столбец 'name' в DataFrame одним поиском по индексу FIGI
             df = portfolio_data
-            df['name'] = df['figi'].apply(find_name)
+            df['name'] = figi_index.lookup(df['figi'])['name'].to_numpy()
 
             # Тестовые изменения (примеры модификации данных)
             df.loc[df.shape[0]] = df.loc[0]
@@ -338,8 +351,8 @@ def portfolio_view(request):
             # Преобразуем DataFrame в список словарей
             table_data = df.to_dict(orient='records')
 
-            # Создаем график с помощью plotly.graph_objects
-            chart_html = get_portfolio_bars(portfolio_data)
+            # График загружается отдельным запросом (portfolio_chart)
+            chart_url = reverse('portfolio_chart') + '?' + urlencode({'account': selected_account_id})
 
         except Exception as e:
             error = f"Ошибка при получении данных портфеля: {str(e)}"
@@ -350,7 +363,7 @@ def portfolio_view(request):
     context = {
         'accounts': accounts,
         'table_data': table_data,
-        'chart_html': chart_html,
+        'chart_url': chart_url,
         'error': error,
         'title': 'Мой портфель',
     }
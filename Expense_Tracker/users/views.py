@@ -10,6 +10,9 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse, reverse_lazy
 from django.views.generic import CreateView, UpdateView
 
+from core.portfolio_cache import portfolio_cache
+from core.tokens import invalidate_token
+
 from .forms import *
 
 class ProfileUser(LoginRequiredMixin, UpdateView):
@@ -127,11 +130,16 @@ class ProfileUser(LoginRequiredMixin, UpdateView):
             token_instance = SystemToken.objects.filter(author=request.user).first()
             token_form = SystemTokenForm(request.POST, instance=token_instance)
             if token_form.is_valid():
-                # Удаляем старые токены перед сохранением нового
-                SystemToken.objects.filter(author=request.user).delete()
+                # Сбрасываем кэш проверки старых токенов и удаляем их перед сохранением нового
+                old_tokens = SystemToken.objects.filter(author=request.user)
+                for old_token in old_tokens.values_list('token', flat=True):
+                    invalidate_token(old_token)
+                    portfolio_cache.invalidate(old_token)
+                old_tokens.delete()
                 new_token = token_form.save(commit=False)
                 new_token.author = request.user
                 new_token.save()
+                invalidate_token(new_token.token)
                 messages.success(request, 'Системный токен успешно обновлен.')
                 return redirect('users:profile')
             else: